@@ -1,9 +1,40 @@
 import pandas as pd
+import numpy as np
 from dataclasses import dataclass
 from datetime import datetime, time
 from typing import List, Dict, Tuple, Optional
 import itertools, random, math
-from openpyxl import load_workbook
+from operator import itemgetter
+from openpyxl import Workbook, load_workbook
+
+# Optional JIT: numba compiles the clash-filter kernel to native code when
+# installed; otherwise the same function runs as plain Python.
+try:
+    from numba import njit
+except ImportError:
+    def njit(*args, **kwargs):
+        def wrap(fn):
+            return fn
+        return wrap
+
+
+@njit(cache=True)
+def _free_slots_mask(conflict_mask: np.ndarray, busy: int) -> int:
+    """Bitmask of slot indices whose conflict set does not touch `busy`."""
+    free = 0
+    for i in range(conflict_mask.shape[0]):
+        if conflict_mask[i] & busy == 0:
+            free |= 1 << i
+    return free
+
+def _free_slots_mask_py(conflict_mask, busy: int) -> int:
+    """Pure-Python twin of _free_slots_mask over a list of Python ints,
+    used when the slot count exceeds what int64 masks can hold."""
+    free = 0
+    for i, cm in enumerate(conflict_mask):
+        if cm & busy == 0:
+            free |= 1 << i
+    return free
 
 def parse_time(val) -> time:
     if pd.isna(val) or val == "":
@@ -54,11 +85,13 @@ class Requirement:
     available_rooms: List[str]  # comma-split in input; empty means no room assignment
     
 class TimetableCSPv2:
-    def __init__(self, timeslots: List[Timeslot], requirements: List[Requirement], days: List[str], teacher_availability=None):
+    def __init__(self, timeslots: List[Timeslot], requirements: List[Requirement], days: List[str], teacher_availability=None, breaks=None, holidays=None):
         self.timeslots = timeslots
         self.requirements = requirements
         self.days = days
         self.teacher_availability = teacher_availability or {}  # <-- Add this line
+        self.breaks = breaks or []
+        self.holidays = set(holidays or [])
 
         self.variables: List[Tuple[str,str,int]] = []
         self.req_index: Dict[Tuple[str,str], Requirement] = {}
@@ -67,127 +100,347 @@ class TimetableCSPv2:
             for i in range(req.slots_required):
                 self.variables.append((req.course_code, req.section_id, i))
 
-        # Domains: each var can be placed on (day, slot_id, room_choice)
-        self.domains: Dict[Tuple[str,str,int], List[Tuple[str,str,str]]] = {}
+        self.ts_by_id: Dict[str, Timeslot] = {ts.id: ts for ts in self.timeslots}
+        # Integer index per slot so occupancy/conflicts can live in bitmasks
+        self.slot_ids: List[str] = [ts.id for ts in self.timeslots]
+        self.slot_index: Dict[str, int] = {sid: i for i, sid in enumerate(self.slot_ids)}
+        self.n_slots = len(self.slot_ids)
+
+        # Overlap by time (day handled in occupancy maps);
+        # conflict_mask[i] has bit j set iff slot i and slot j overlap (includes i itself)
+        self.conflict_mask: List[int] = [1 << i for i in range(self.n_slots)]
+        for (i, a), (j, b) in itertools.combinations(enumerate(self.timeslots), 2):
+            if overlap(a.start, a.end, b.start, b.end):
+                self.conflict_mask[i] |= 1 << j
+                self.conflict_mask[j] |= 1 << i
+
+        # conflict_mask as int64 ndarray so the clash kernel stays monomorphic
+        # (numba-compilable); slot counts beyond 62 would overflow int64, so
+        # wider instances keep the Python-int masks and the pure-Python kernel
+        if self.n_slots > 62:
+            self.conflict_arr = self.conflict_mask
+            self._free_slots = _free_slots_mask_py
+        else:
+            self.conflict_arr = np.asarray(self.conflict_mask, dtype=np.int64)
+            self._free_slots = _free_slots_mask
+
+        # Domains: each var can be placed on (day, slot_id, room_choice).
+        # Stored per var as one slot bitmask per (day, room) pair, so pruning
+        # and clash filtering are word-parallel AND/OR over small ints.
+        self.var_rooms: Dict[Tuple[str,str,int], List[str]] = {}
+        self.domain_slots: Dict[Tuple[str,str,int], Dict[Tuple[str,str], int]] = {}
+        full_slots = (1 << self.n_slots) - 1
+        # Variables with the same room list start from the same template dict;
+        # only the per-var copy (which gets pruned) is materialized per var
+        domain_template: Dict[Tuple[str, ...], Dict[Tuple[str, str], int]] = {}
         for var in self.variables:
             c, s, _ = var
             req = self.req_index[(c, s)]
             rooms = req.available_rooms if req.available_rooms else [""]
-            combos = list(itertools.product(self.days, [ts.id for ts in self.timeslots], rooms))
-            self.domains[var] = [(d, sid, r) for (d, sid, r) in combos]
-
-        self.ts_by_id: Dict[str, Timeslot] = {ts.id: ts for ts in self.timeslots}
-        # Overlap by time (day handled in occupancy maps)
-        self.conflicts: Dict[str, set] = {ts.id: {ts.id} for ts in self.timeslots}
-        for a, b in itertools.combinations(self.timeslots, 2):
-            if overlap(a.start, a.end, b.start, b.end):
-                self.conflicts[a.id].add(b.id)
-                self.conflicts[b.id].add(a.id)
+            self.var_rooms[var] = rooms
+            tpl = domain_template.get(tuple(rooms))
+            if tpl is None:
+                tpl = {(d, r): full_slots for d in self.days for r in rooms}
+                domain_template[tuple(rooms)] = tpl
+            self.domain_slots[var] = dict(tpl)
+
+        # Prune break/holiday clashes once, up front, instead of rediscovering
+        # them at every backtrack node (breaks were previously display-only)
+        if self.holidays:
+            for var in self.variables:
+                dom = self.domain_slots[var]
+                for key in dom:
+                    if key[0] in self.holidays:
+                        dom[key] = 0
+        for br in self.breaks:
+            break_mask = 0
+            for i, ts in enumerate(self.timeslots):
+                if overlap(ts.start, ts.end, br["break_from"], br["break_to"]):
+                    break_mask |= 1 << i
+            if not break_mask:
+                continue
+            for var in self.variables:
+                c, s, _ = var
+                req = self.req_index[(c, s)]
+                if br["section"] and br["section"] != req.section_id:
+                    continue
+                if br["curriculum"] and br["curriculum"] != req.curriculum:
+                    continue
+                if br["semester"] and br["semester"] != req.semester:
+                    continue
+                dom = self.domain_slots[var]
+                for r in self.var_rooms[var]:
+                    key = (br["day"], r)
+                    if key in dom:
+                        dom[key] &= ~break_mask
 
         self.assignment: Dict[Tuple[str,str,int], Tuple[str,str,str]] = {}
-        self.partial_minutes: Dict[Tuple[str,str], int] = {(c,s):0 for (c,s) in self.req_index.keys()}
 
-        # Day-wise occupancy to avoid clashes
-        self.section_busy = {d: {} for d in self.days}  # day -> section -> set(slot_ids)
-        self.teacher_busy = {d: {} for d in self.days}  # day -> teacher -> set(slot_ids)
-        self.room_busy    = {d: {} for d in self.days}  # day -> room -> set(slot_ids)
+        # Interned integer ids so the hot path indexes flat lists instead of
+        # hashing day/section/teacher/room strings and (course, section) tuples
+        self.day_index: Dict[str, int] = {d: i for i, d in enumerate(self.days)}
+        self.req_id: Dict[Tuple[str,str], int] = {key: i for i, key in enumerate(self.req_index.keys())}
+        self.section_index: Dict[str, int] = {}
+        self.teacher_index: Dict[str, int] = {}
+        self.room_index: Dict[str, int] = {}
+        for req in requirements:
+            self.section_index.setdefault(req.section_id, len(self.section_index))
+            self.teacher_index.setdefault(req.teacher, len(self.teacher_index))
+            for r in req.available_rooms:
+                self.room_index.setdefault(r, len(self.room_index))
+        # var -> (req id, section id, teacher id)
+        self.var_ids: Dict[Tuple[str,str,int], Tuple[int,int,int]] = {}
+        for var in self.variables:
+            c, s, _ = var
+            req = self.req_index[(c, s)]
+            self.var_ids[var] = (
+                self.req_id[(c, s)],
+                self.section_index[s],
+                self.teacher_index[req.teacher],
+            )
+
+        self.partial_minutes: List[int] = [0] * len(self.req_index)
+
+        # Hoisted _is_feasible invariants: these were recomputed per candidate
+        self.max_slot_min = max((t.duration_min for t in self.timeslots), default=0)
+        self.min_needed: List[int] = [
+            int(req.min_total_hours * 60) for req in self.req_index.values()
+        ]
+        self.slots_assigned: List[int] = [0] * len(self.req_index)
+        # teacher -> day -> list of (start, end) windows, to skip the per-call scan
+        self.teacher_avail_by_day: Dict[str, Dict[str, list]] = {}
+        for teacher, periods in self.teacher_availability.items():
+            by_day = self.teacher_avail_by_day.setdefault(teacher, {})
+            for day, start, end in periods:
+                by_day.setdefault(day, []).append((start, end))
+
+        # teacher -> day -> bitmask of slots that fit some availability window,
+        # so the availability test is a single shift+and per candidate
+        self.teacher_allowed: Dict[str, Dict[str, int]] = {}
+        for teacher, by_day in self.teacher_avail_by_day.items():
+            day_masks = {}
+            for day, windows in by_day.items():
+                mask = 0
+                for i, ts in enumerate(self.timeslots):
+                    if any(ts.start >= w_start and ts.end <= w_end for w_start, w_end in windows):
+                        mask |= 1 << i
+                day_masks[day] = mask
+            self.teacher_allowed[teacher] = day_masks
+
+        # Fold the static availability masks into the domains so the live
+        # domain_size counters below only count genuinely placeable values
+        for var in self.variables:
+            c, s, _ = var
+            allowed = self.teacher_allowed.get(self.req_index[(c, s)].teacher)
+            if allowed is None:
+                continue
+            dom = self.domain_slots[var]
+            for key in dom:
+                dom[key] &= allowed.get(key[0], 0)
+
+        # Day-wise occupancy to avoid clashes; one bitmask of slot indices per
+        # entity, stored as flat [day_id][entity_id] lists
+        n_days = len(self.days)
+        self.section_busy = [[0] * len(self.section_index) for _ in range(n_days)]
+        self.teacher_busy = [[0] * len(self.teacher_index) for _ in range(n_days)]
+        self.room_busy    = [[0] * len(self.room_index) for _ in range(n_days)]
+
+        # Forward checking: neighbor indexes, live domain sizes, and an undo
+        # trail so _place can prune future domains and _remove can restore them
+        self.vars_by_section: Dict[str, list] = {}
+        self.vars_by_teacher: Dict[str, list] = {}
+        self.vars_by_room: Dict[str, list] = {}
+        for v in self.variables:
+            vc, vs, _ = v
+            self.vars_by_section.setdefault(vs, []).append(v)
+            self.vars_by_teacher.setdefault(self.req_index[(vc, vs)].teacher, []).append(v)
+            for r in self.var_rooms[v]:
+                if r:
+                    self.vars_by_room.setdefault(r, []).append(v)
+        self.domain_size: Dict[Tuple[str,str,int], int] = {
+            v: sum(m.bit_count() for m in self.domain_slots[v].values()) for v in self.variables
+        }
+        self.trail: List[list] = []
+
+    def _prune_neighbor(self, var2, day, room, conflict, frame) -> bool:
+        """Clear conflicting slot bits from var2's domain; False if it empties."""
+        dom = self.domain_slots[var2]
+        if room is None:
+            keys = [(day, r) for r in self.var_rooms[var2]]
+        else:
+            keys = [(day, room)] if (day, room) in dom else []
+        ok = True
+        for key in keys:
+            removed = dom[key] & conflict
+            if removed:
+                dom[key] ^= removed
+                frame.append((var2, key, removed))
+                self.domain_size[var2] -= removed.bit_count()
+                if self.domain_size[var2] == 0:
+                    ok = False
+        return ok
+
+    def _iter_domain(self, var):
+        for (day, room), mask in self.domain_slots[var].items():
+            while mask:
+                low = mask & -mask
+                mask ^= low
+                yield (day, self.slot_ids[low.bit_length() - 1], room)
+
+    def _iter_candidates(self, var):
+        # Filter whole (day, room) groups through the jittable clash kernel
+        # before confirming the per-slot constraints with _is_feasible.
+        _, sec_i, tch_i = self.var_ids[var]
+        for (day, room), mask in self.domain_slots[var].items():
+            day_i = self.day_index[day]
+            busy = self.section_busy[day_i][sec_i] | self.teacher_busy[day_i][tch_i]
+            if room:
+                busy |= self.room_busy[day_i][self.room_index[room]]
+            mask &= int(self._free_slots(self.conflict_arr, busy))
+            while mask:
+                low = mask & -mask
+                mask ^= low
+                val = (day, self.slot_ids[low.bit_length() - 1], room)
+                if self._is_feasible(var, val):
+                    yield val
 
     def _is_feasible(self, var, val) -> bool:
         c, s, _ = var
         day, slot_id, room = val
+        rid, sec_i, tch_i = self.var_ids[var]
         req = self.req_index[(c, s)]
         ts = self.ts_by_id[slot_id]
-      
-        available_periods = self.teacher_availability.get(req.teacher, [])
-        if available_periods:
+
+        slot_idx = self.slot_index[slot_id]
+        allowed = self.teacher_allowed.get(req.teacher)
+        if allowed is not None:
             # Only allow if the timeslot fits within any available period for this day
-            fits = any(
-                day == ap[0] and ts.start >= ap[1] and ts.end <= ap[2]
-                for ap in available_periods
-            )
-            if not fits:
+            if not (allowed.get(day, 0) >> slot_idx) & 1:
                 return False
 
+        day_i = self.day_index[day]
+        conflict = self.conflict_mask[slot_idx]
         # Section clash
-        for used_slot in self.section_busy[day].get(s, set()):
-            if slot_id in self.conflicts[used_slot]:
-                return False
+        if self.section_busy[day_i][sec_i] & conflict:
+            return False
         # Teacher clash
-        for used_slot in self.teacher_busy[day].get(req.teacher, set()):
-            if slot_id in self.conflicts[used_slot]:
-                return False
+        if self.teacher_busy[day_i][tch_i] & conflict:
+            return False
         # Room clash
-        if room:
-            for used_slot in self.room_busy[day].get(room, set()):
-                if slot_id in self.conflicts[used_slot]:
-                    return False
+        if room and self.room_busy[day_i][self.room_index[room]] & conflict:
+            return False
 
         # Duration feasibility (can we still reach min_total_hours?)
-        assigned_count = sum(1 for v in self.assignment if v[0]==c and v[1]==s)
-        remaining = self.req_index[(c,s)].slots_required - assigned_count - 1
-        max_slot = max(t.duration_min for t in self.timeslots)
-        min_needed = int(self.req_index[(c,s)].min_total_hours * 60)
-        future_possible = self.partial_minutes[(c,s)] + ts.duration_min + remaining * max_slot
-        return future_possible >= min_needed
+        remaining = req.slots_required - self.slots_assigned[rid] - 1
+        future_possible = self.partial_minutes[rid] + ts.duration_min + remaining * self.max_slot_min
+        return future_possible >= self.min_needed[rid]
 
     def _place(self, var, val):
         c, s, _ = var
         day, slot_id, room = val
+        rid, sec_i, tch_i = self.var_ids[var]
         req = self.req_index[(c, s)]
         ts = self.ts_by_id[slot_id]
+        bit = 1 << self.slot_index[slot_id]
+        day_i = self.day_index[day]
 
         self.assignment[var] = val
-        self.partial_minutes[(c,s)] += ts.duration_min
+        self.partial_minutes[rid] += ts.duration_min
+        self.slots_assigned[rid] += 1
 
-        self.section_busy[day].setdefault(s, set()).add(slot_id)
-        self.teacher_busy[day].setdefault(req.teacher, set()).add(slot_id)
+        self.section_busy[day_i][sec_i] |= bit
+        self.teacher_busy[day_i][tch_i] |= bit
         if room:
-            self.room_busy[day].setdefault(room, set()).add(slot_id)
+            self.room_busy[day_i][self.room_index[room]] |= bit
+
+        # Forward-check: prune now-conflicting values from unassigned neighbors
+        conflict = self.conflict_mask[self.slot_index[slot_id]]
+        frame = []
+        ok = True
+        for var2 in self.vars_by_section.get(s, []):
+            if var2 is not var and var2 not in self.assignment:
+                ok &= self._prune_neighbor(var2, day, None, conflict, frame)
+        for var2 in self.vars_by_teacher.get(req.teacher, []):
+            if var2 is not var and var2 not in self.assignment:
+                ok &= self._prune_neighbor(var2, day, None, conflict, frame)
+        if room:
+            for var2 in self.vars_by_room.get(room, []):
+                if var2 is not var and var2 not in self.assignment:
+                    ok &= self._prune_neighbor(var2, day, room, conflict, frame)
+        self.trail.append(frame)
+        return ok
 
     def _remove(self, var, val):
         c, s, _ = var
         day, slot_id, room = val
-        req = self.req_index[(c, s)]
+        rid, sec_i, tch_i = self.var_ids[var]
         ts = self.ts_by_id[slot_id]
+        bit = 1 << self.slot_index[slot_id]
+        day_i = self.day_index[day]
 
-        del self.assignment[var]
-        self.partial_minutes[(c,s)] -= ts.duration_min
-
-        self.section_busy[day][s].remove(slot_id)
-        if not self.section_busy[day][s]:
-            del self.section_busy[day][s]
+        for var2, key, bits in reversed(self.trail.pop()):
+            self.domain_slots[var2][key] |= bits
+            self.domain_size[var2] += bits.bit_count()
 
-        self.teacher_busy[day][req.teacher].remove(slot_id)
-        if not self.teacher_busy[day][req.teacher]:
-            del self.teacher_busy[day][req.teacher]
+        del self.assignment[var]
+        self.partial_minutes[rid] -= ts.duration_min
+        self.slots_assigned[rid] -= 1
 
+        self.section_busy[day_i][sec_i] &= ~bit
+        self.teacher_busy[day_i][tch_i] &= ~bit
         if room:
-            self.room_busy[day][room].remove(slot_id)
-            if not self.room_busy[day][room]:
-                del self.room_busy[day][room]
+            self.room_busy[day_i][self.room_index[room]] &= ~bit
 
     def _mrv(self):
+        # domain_size is kept current by the forward-checking trail, so MRV is
+        # a plain min over counters instead of re-enumerating candidates
         best, best_size = None, math.inf
         for var in self.variables:
             if var in self.assignment:
                 continue
-            feasible_count = 0
-            for val in self.domains[var]:
-                if self._is_feasible(var, val):
-                    feasible_count += 1
-                    if feasible_count >= best_size:
-                        break
-            if feasible_count < best_size:
-                best, best_size = var, feasible_count
-                if best_size == 0:
-                    break
+            size = self.domain_size[var]
+            if size <= 1:
+                # dead end (0) or unit variable (1): no smaller domain can
+                # change what happens next, so stop scanning
+                return var
+            if size < best_size:
+                best, best_size = var, size
         return best
 
+    def _order_values(self, var, candidates):
+        # LCV: try values that knock the fewest options out of unassigned
+        # neighbors (same section or teacher) first
+        c, s, _ = var
+        teacher = self.req_index[(c, s)].teacher
+        neighbors = [
+            v2 for v2 in dict.fromkeys(
+                self.vars_by_section.get(s, []) + self.vars_by_teacher.get(teacher, [])
+            )
+            if v2 is not var and v2 not in self.assignment
+        ]
+        if not neighbors:
+            return candidates
+
+        def impact(val):
+            day, slot_id, room = val
+            conflict = self.conflict_mask[self.slot_index[slot_id]]
+            score = 0
+            for var2 in neighbors:
+                dom = self.domain_slots[var2]
+                for r in self.var_rooms[var2]:
+                    if dom[(day, r)] & conflict:
+                        score += 1
+                        break
+            return score
+
+        candidates.sort(key=impact)
+        return candidates
+
     def _backtrack(self) -> bool:
         if len(self.assignment) == len(self.variables):
             # final check: min hours
-            for (c, s), req in self.req_index.items():
-                if self.partial_minutes[(c, s)] < int(req.min_total_hours*60):
+            for rid in range(len(self.min_needed)):
+                if self.partial_minutes[rid] < self.min_needed[rid]:
                     return False
             return True
 
@@ -195,43 +448,143 @@ class TimetableCSPv2:
         if var is None:
             return False
 
-        candidates = [v for v in self.domains[var] if self._is_feasible(var, v)]
-        random.shuffle(candidates)
+        candidates = list(self._iter_candidates(var))
+        if len(candidates) > 1:
+            # shuffle first so the LCV sort breaks ties by the run's seed;
+            # unit variables skip ordering entirely
+            random.shuffle(candidates)
+            self._order_values(var, candidates)
 
         for val in candidates:
-            self._place(var, val)
-            if self._backtrack():
+            if self._place(var, val) and self._backtrack():
                 return True
             self._remove(var, val)
 
         return False
 
-    def solve(self, seed: int = 123):
+    def solve(self, seed: int = 123, parallel: bool = False, workers: int = None):
         random.seed(seed)
+        if parallel:
+            result = self._solve_parallel(seed, workers)
+            if result is None:
+                raise RuntimeError("No feasible timetable found with current inputs/constraints.")
+            return result
         if not self._backtrack():
             raise RuntimeError("No feasible timetable found with current inputs/constraints.")
         return dict(self.assignment)
-    
-def read_input_v2(xlsx_path: str):
-    xls = pd.ExcelFile(xlsx_path)
-    window = pd.read_excel(xlsx_path, "WINDOW")
-    slots  = pd.read_excel(xlsx_path, "TIMESLOTS")
-    reqdf  = pd.read_excel(xlsx_path, "REQUIREMENTS")
-    daysdf = pd.read_excel(xlsx_path, "DAYS") if "DAYS" in xls.sheet_names else pd.DataFrame({"day":["Mon","Tue","Wed","Thu","Fri"]})
+
+    def _solve_parallel(self, seed: int, workers: int = None):
+        # Split the first MRV variable's candidates into disjoint chunks and
+        # let each worker process search its own subtree; first solution wins.
+        #
+        # Plain Process + terminate() rather than a pool: a running pool
+        # future can't be cancelled and the pool joins its workers on
+        # shutdown, so the first win would still wait for every losing
+        # subtree to be searched to exhaustion.
+        import multiprocessing as mp
+        import os
+
+        var0 = self._mrv()
+        if var0 is None:
+            return None
+        candidates = list(self._iter_candidates(var0))
+        if not candidates:
+            return None
+        random.shuffle(candidates)
+
+        workers = workers or os.cpu_count() or 1
+        workers = min(workers, len(candidates))
+        chunks = [candidates[i::workers] for i in range(workers)]
+
+        base = (self.timeslots, self.requirements, self.days,
+                self.teacher_availability, self.breaks, self.holidays)
+        result_queue = mp.Queue()
+        procs = [
+            mp.Process(target=_solve_subspace,
+                       args=(base, var0, chunk, seed + i, result_queue),
+                       daemon=True)
+            for i, chunk in enumerate(chunks)
+        ]
+        for p in procs:
+            p.start()
+        result = None
+        try:
+            # Every worker posts exactly one result (None on failure), so
+            # this loop ends on the first win or after all workers report
+            for _ in range(len(procs)):
+                result = result_queue.get()
+                if result is not None:
+                    break
+        finally:
+            for p in procs:
+                p.terminate()
+            for p in procs:
+                p.join()
+        return result
+
+def _solve_subspace(base, var0, chunk, seed, result_queue):
+    """Worker: search the subtree rooted at each pre-placed candidate of var0.
+
+    Posts the solution dict (or None) to result_queue; posting from a
+    finally block keeps the parent's result count exact even if the
+    search raises."""
+    timeslots, requirements, days, teacher_availability, breaks, holidays = base
+    random.seed(seed)
+    result = None
+    try:
+        engine = TimetableCSPv2(timeslots, requirements, days, teacher_availability,
+                                breaks=breaks, holidays=holidays)
+        for val in chunk:
+            if not engine._is_feasible(var0, val):
+                continue
+            if engine._place(var0, val) and engine._backtrack():
+                result = dict(engine.assignment)
+                break
+            engine._remove(var0, val)
+    finally:
+        result_queue.put(result)
+
+
+def _parse_time_column(series) -> pd.Series:
+    # Column-wise time parsing in C instead of per-cell parse_time calls;
+    # unparseable cells come back as NaN and are handled by the caller.
+    # Normalize like parse_time did ('1.30 pm' -> '1:30 PM') so the
+    # vectorized path accepts the same inputs the per-cell one did
+    s = series.astype(str).str.strip().str.upper().str.replace('.', ':', regex=False)
+    return pd.to_datetime(s, format="mixed", errors="coerce").dt.time
+
+
+def read_input_v2(xlsx_path: str, xls: pd.ExcelFile = None):
+    # One ExcelFile handle: the workbook zip is unpacked once, not per sheet;
+    # callers that already hold a handle (e.g. for sheet validation) pass it in
+    if xls is None:
+        xls = pd.ExcelFile(xlsx_path, engine="openpyxl")
+    window = pd.read_excel(xls, "WINDOW")
+    slots  = pd.read_excel(xls, "TIMESLOTS")
+    reqdf  = pd.read_excel(xls, "REQUIREMENTS")
+    daysdf = pd.read_excel(xls, "DAYS") if "DAYS" in xls.sheet_names else pd.DataFrame({"day":["Mon","Tue","Wed","Thu","Fri"]})
 
     start_date = str(window.iloc[0]["start_date"])
     end_date   = str(window.iloc[0]["end_date"])
 
     # ✅ Build timeslots
-    timeslots = [
-        Timeslot(str(r.slot_id), parse_time(str(r.start_time)), parse_time(str(r.end_time)))
-        for r in slots.itertuples(index=False)
-    ]
+    slots["start_time"] = _parse_time_column(slots["start_time"])
+    slots["end_time"] = _parse_time_column(slots["end_time"])
+    timeslots = []
+    for r in slots.itertuples(index=False):
+        if pd.isna(r.start_time) or pd.isna(r.end_time):
+            raise ValueError(f"Invalid time format in TIMESLOTS row: slot_id={r.slot_id}")
+        timeslots.append(Timeslot(str(r.slot_id), r.start_time, r.end_time))
 
     # ✅ Build requirements
+    # Split the rooms column once in pandas' C path; the loop only strips
+    if "available_rooms" in reqdf.columns:
+        rooms_lists = reqdf["available_rooms"].fillna("").astype(str).str.split(",").tolist()
+    else:
+        rooms_lists = [[] for _ in range(len(reqdf))]
     reqs = []
-    for r in reqdf.itertuples(index=False):
-        rooms = [x.strip() for x in str(getattr(r, "available_rooms", "") or "").split(",") if x.strip()]
+    for r, raw_rooms in zip(reqdf.itertuples(index=False), rooms_lists):
+        rooms = [x.strip() for x in raw_rooms if x and x.strip()]
         reqs.append(Requirement(
             course_code=str(r.course_code),
             curriculum=str(r.curriculum),
@@ -249,11 +602,14 @@ def read_input_v2(xlsx_path: str):
     # ✅ Breaks
     breaks = []
     if "BREAKS" in xls.sheet_names:
-        brdf = pd.read_excel(xlsx_path, "BREAKS")
+        brdf = pd.read_excel(xls, "BREAKS")
+        for col in ("break_from", "break_to"):
+            if col in brdf.columns:
+                brdf[col] = _parse_time_column(brdf[col])
         for r in brdf.itertuples(index=False):
-            bf = parse_time(getattr(r, "break_from", "") or "")
-            bt = parse_time(getattr(r, "break_to", "") or "")
-            if bf is None or bt is None:
+            bf = getattr(r, "break_from", None)
+            bt = getattr(r, "break_to", None)
+            if bf is None or bt is None or pd.isna(bf) or pd.isna(bt):
                 print(f"⚠️ Skipping BREAKS row with invalid time: {r}")
                 continue
             breaks.append({
@@ -268,13 +624,15 @@ def read_input_v2(xlsx_path: str):
     # ✅ Teacher availability
     teacher_availability = {}
     if "TEACHER_AVAILABILITY" in xls.sheet_names:
-        tavdf = pd.read_excel(xlsx_path, "TEACHER_AVAILABILITY")
+        tavdf = pd.read_excel(xls, "TEACHER_AVAILABILITY")
+        tavdf["available_from"] = _parse_time_column(tavdf["available_from"])
+        tavdf["available_to"] = _parse_time_column(tavdf["available_to"])
         for r in tavdf.itertuples(index=False):
             teacher = str(r.teacher).strip()
             day = str(r.day).strip()
-            start = parse_time(str(r.available_from))
-            end = parse_time(str(r.available_to))
-            if start is None or end is None:
+            start = r.available_from
+            end = r.available_to
+            if start is None or end is None or pd.isna(start) or pd.isna(end):
                 print(f"⚠️ Skipping TEACHER_AVAILABILITY row with invalid time: {r}")
                 continue
             teacher_availability.setdefault(teacher, []).append((day, start, end))
@@ -317,7 +675,7 @@ def export_to_template(assignments, engine, start_date, end_date, output_xlsx, t
     for (course, section, _), (day, slot_id, room) in assignments.items():
         ts = engine.ts_by_id[slot_id]
         req = engine.req_index[(course, section)]
-        buckets[(course, section)].append({
+        buckets[(course, req.curriculum, req.semester, section)].append({
             "course": course,
             "section": section,
             "teacher": req.teacher,
@@ -327,18 +685,22 @@ def export_to_template(assignments, engine, start_date, end_date, output_xlsx, t
             "time_from": ts.start.strftime("%H:%M:%S"),
             "time_to": ts.end.strftime("%H:%M:%S"),
             "room": room or "",
-            "start": ts.start.strftime("%H:%M")
+            "sort_key": (day_rank.get(day, 999), ts.start.hour * 60 + ts.start.minute)
         })
 
     # Inject break slots (for all courses/sections, common for each day)
     sections = {(req.curriculum, req.semester, req.section_id) for req in engine.requirements}
+    bh, bm = break_start.split(":")
+    break_minutes = int(bh) * 60 + int(bm)
 
     for (curr, sem, sec) in sections:
         for day in engine.days:
             if day in holidays:
                 continue
-            # bucket key without course
-            buckets[(None, sec)].append({
+            # Key by the full (curriculum, semester, section) identity so
+            # sections shared across curricula don't collapse into one bucket
+            # and emit duplicate break rows
+            buckets[("__BREAK__", curr, sem, sec)].append({
                 "course": "",   # no course
                 "section": sec,
                 "teacher": "",  # no teacher
@@ -348,14 +710,15 @@ def export_to_template(assignments, engine, start_date, end_date, output_xlsx, t
                 "time_from": f"{break_start}:00",
                 "time_to": f"{break_end}:00",
                 "room": "BREAK",
-                "start": break_start
+                "sort_key": (day_rank.get(day, 999), break_minutes)
             })
 
 
     # Build final rows
     rows = []
     for key, items in buckets.items():
-        items.sort(key=lambda x: (day_rank.get(x["day"], 999), x["start"]))
+        # sort keys are plain int tuples precomputed at insert time
+        items.sort(key=itemgetter("sort_key"))
         for off in range(0, len(items), 5):
             chunk = items[off:off + 5]
             base = chunk[0]
@@ -377,24 +740,18 @@ def export_to_template(assignments, engine, start_date, end_date, output_xlsx, t
                     row[dcol] = row[tfcol] = row[ttcol] = row[rcol] = row[lcol] = ""
             rows.append(row)
 
-    out_df = pd.DataFrame(rows, columns=[
-        "STARTDATE", "ENDDATE", "CURRICULUM", "COURSE", "SEMESTER", "SECTION", "TEACHER",
-        "DAY1", "DAY1_TIME_FROM", "DAY1_TIME_TO", "DAY1_ROOM", "DAY1_LINK",
-        "DAY2", "DAY2_TIME_FROM", "DAY2_TIME_TO", "DAY2_ROOM", "DAY2_LINK",
-        "DAY3", "DAY3_TIME_FROM", "DAY3_TIME_TO", "DAY3_ROOM", "DAY3_LINK",
-        "DAY4", "DAY4_TIME_FROM", "DAY4_TIME_TO", "DAY4_ROOM", "DAY4_LINK",
-        "DAY5", "DAY5_TIME_FROM", "DAY5_TIME_TO", "DAY5_ROOM", "DAY5_LINK"
-    ])
+    # Only the header row is needed from the template; stream the output
+    # through a write-only workbook instead of mutating the loaded template
+    # (which kept the full cell grid in memory and paid for delete_rows)
+    tpl = load_workbook(template_xlsx, read_only=True)
+    headers = [c.value for c in next(tpl["TimeTable"].iter_rows(max_row=1))]
+    tpl.close()
 
-    wb = load_workbook(template_xlsx)
-    ws = wb["TimeTable"]
-    headers = [c.value for c in ws[1]]
-
-    if ws.max_row > 1:
-        ws.delete_rows(2, ws.max_row - 1)
-
-    for _, r in out_df.iterrows():
-        ws.append([r.get(h, "") for h in headers])
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("TimeTable")
+    ws.append(headers)
+    for row in rows:
+        ws.append([row.get(h, "") for h in headers])
 
     wb.save(output_xlsx)
     return output_xlsx
@@ -413,19 +770,12 @@ input_xlsx = "InputData_Original.xlsx"
 
 print("Using:", input_xlsx)
 
-# Read breaks sheet
-breaks_df = pd.read_excel(input_xlsx, sheet_name="BREAKS")
-
-# Function to fetch break time
+# Function to fetch break time (reads the breaks already parsed by read_input_v2)
 def get_break_time(curriculum, semester, section_id, day):
-    match = breaks_df[
-        (breaks_df["curriculum"] == curriculum) &
-        (breaks_df["semester"] == semester) &
-        (breaks_df["section_id"] == section_id) &
-        (breaks_df["day"] == day)
-    ]
-    if not match.empty:
-        return match.iloc[0]["break_from"], match.iloc[0]["break_to"]
+    for br in data["breaks"]:
+        if (br["curriculum"] == str(curriculum) and br["semester"] == str(semester)
+                and br["section"] == str(section_id) and br["day"] == str(day)):
+            return br["break_from"], br["break_to"]
     return None, None
 
 # Quick validation
@@ -433,7 +783,8 @@ def get_break_time(curriculum, semester, section_id, day):
 if not os.path.exists(input_xlsx):
     raise FileNotFoundError(f"❌ File not found: {input_xlsx}")
     
-xls = pd.ExcelFile(input_xlsx)
+# Single open: the same handle validates sheets and feeds read_input_v2
+xls = pd.ExcelFile(input_xlsx, engine="openpyxl")
 missing = [s for s in REQUIRED_SHEETS if s not in xls.sheet_names]
 
 if missing:
@@ -453,13 +804,14 @@ else:
 
 
 # Now run the pipeline with this uploaded input
-data = read_input_v2(input_xlsx)
+data = read_input_v2(input_xlsx, xls=xls)
 
 engine = TimetableCSPv2(
-    data["timeslots"], 
-    data["requirements"], 
+    data["timeslots"],
+    data["requirements"],
     data["days"],
-    data['teacher_availability']  # <-- pass teacher availability here
+    data['teacher_availability'],  # <-- pass teacher availability here
+    breaks=data["breaks"]  # <-- solver now avoids break windows up front
 )
 
 print("Generating timetable... This may take a few seconds.")
@@ -3,68 +3,328 @@ Standalone script to generate timetable - called by Streamlit app
 Usage: python generate_timetable.py <input_file> <template_file> <output_file> [--debug] [--max-attempts N]
 """
 
+import io
+import mmap
+import os
 import sys
 import argparse
 
-# Import from ttv5 - this will work when run as a script
-import ttv5
+# Parsed input shared with forked workers copy-on-write; see _generate.
+# Only consulted when a task is submitted with data=None.
+_SHARED_DATA = None
 
-def main():
-    parser = argparse.ArgumentParser(description='Generate timetable from Excel input')
-    parser.add_argument('input_file', help='Path to input Excel file (InputData_v2.xlsx)')
-    parser.add_argument('template_file', help='Path to template Excel file (TimeTableImport_SIS.xlsx)')
-    parser.add_argument('output_file', help='Path to output Excel file')
-    parser.add_argument('--debug', action='store_true', help='Enable debug mode')
-    parser.add_argument('--max-attempts', type=int, default=200, help='Max attempts per variable')
-    parser.add_argument('--seed', type=int, default=123, help='Random seed')
-    
-    args = parser.parse_args()
-    
+def _pin_to_core(index):
+    """Pin the calling process to one core (best effort, Linux only).
+
+    A single-threaded search keeps its CSP state cache-resident; letting the
+    scheduler migrate it between cores flushes that for nothing.
+    """
+    if hasattr(os, 'sched_setaffinity'):
+        try:
+            os.sched_setaffinity(0, {index % (os.cpu_count() or 1)})
+        except OSError:
+            pass
+
+def _solve_with_seed(data, seed, debug, domain_restriction=None, cpu_index=None):
+    """Worker entry point for the parallel search: build a fresh engine and
+    solve under one seed. Module-level so ProcessPoolExecutor can pickle it.
+    With a domain_restriction the worker explores only its slice of the
+    search space (partition mode)."""
+    import ttv5
+    if data is None:
+        data = _SHARED_DATA
+    if cpu_index is not None:
+        _pin_to_core(cpu_index)
+    engine = ttv5.TimetableCSPv2(
+        data["timeslots"],
+        data["requirements"],
+        data["days"],
+        data["teacher_availability"],
+        allow_partial=True,
+        debug=debug,
+        domain_restriction=domain_restriction
+    )
+    assignments = engine.solve(seed=seed)
+    return engine, assignments
+
+def _portfolio_worker(data, seed, debug, domain_restriction, cpu_index, result_queue):
+    """Process entry point for the portfolio search: solve one seed (or
+    partition bucket) and post (engine, assignments) to the result queue.
+    Posting from a finally block keeps the parent's receive count exact:
+    a worker that errors posts None (its traceback goes to stderr)."""
+    result = None
+    try:
+        result = _solve_with_seed(data, seed, debug, domain_restriction, cpu_index)
+    finally:
+        result_queue.put(result)
+
+def _generate(args, ttv5, template_source=None):
+    """Run one generation job end to end. `template_source` optionally
+    overrides args.template_file with a preloaded file-like (serve mode)."""
     try:
+        if args.debug:
+            # Debug traces print per search node; block-buffer stdout so each
+            # print doesn't take the stdout lock and a write syscall on its own
+            try:
+                sys.stdout.reconfigure(line_buffering=False, write_through=False)
+                import atexit
+                atexit.register(sys.stdout.flush)
+            except (AttributeError, ValueError, OSError):
+                pass  # non-reconfigurable stream (redirected/serve mode)
+
         # Read input data
         print(f"[INFO] Reading input from: {args.input_file}")
-        data = ttv5.read_input_v2(args.input_file)
-        
-        # Initialize solver
-        print(f"[INFO] Initializing solver...")
-        engine = ttv5.TimetableCSPv2(
-            data["timeslots"],
-            data["requirements"],
-            data["days"],
-            data['teacher_availability'],
-            allow_partial=True,
-            debug=args.debug
-        )
-        
-        print(f"[INFO] Loaded {len(engine.days)} days, {len(engine.timeslots)} timeslots, {len(engine.requirements)} requirements")
-        
-        # Solve
-        print(f"[INFO] Generating timetable...")
-        assignments = engine.solve(seed=args.seed)
-        
-        # Export
+        if args.no_cache:
+            data = ttv5.read_input_v2(args.input_file)
+        else:
+            data = ttv5.read_input_cached(args.input_file)
+
+        print(f"[INFO] Loaded {len(data['days'])} days, {len(data['timeslots'])} timeslots, {len(data['requirements'])} requirements")
+
+        if args.workers > 1:
+            # Portfolio parallelism: CSP runtimes are heavy-tailed across
+            # seeds, so race differently-seeded searches and keep the one
+            # with the fewest unscheduled requirements (first full schedule
+            # wins immediately)
+            print(f"[INFO] Generating timetable ({args.workers} portfolio workers)...")
+            import multiprocessing as mp
+
+            # Under fork, workers inherit the parsed input copy-on-write via
+            # the module global instead of re-pickling it per launched worker
+            global _SHARED_DATA
+            if mp.get_start_method() == 'fork':
+                _SHARED_DATA = data
+                task_data = None
+            else:
+                task_data = data
+
+            # Plain Process + terminate() rather than a pool: a running pool
+            # future can't be cancelled and abandoned workers get joined at
+            # interpreter exit, so breaking on the first full schedule would
+            # still leave the CLI waiting for the slowest seed to exhaust
+            # its whole search
+            result_queue = mp.Queue()
+            if args.partition:
+                # Split the largest domain into disjoint buckets so the
+                # workers cover the search space exactly once between them
+                probe = ttv5.TimetableCSPv2(
+                    data["timeslots"], data["requirements"], data["days"],
+                    data['teacher_availability'], allow_partial=True
+                )
+                split_var = max(probe.domains, key=lambda v: len(probe.domains[v]))
+                dom = probe.domains[split_var]
+                n_parts = min(args.workers, len(dom))
+                buckets = [dom[i::n_parts] for i in range(n_parts)]
+                procs = [mp.Process(target=_portfolio_worker,
+                                    args=(task_data, args.seed, args.debug,
+                                          {split_var: bucket}, i, result_queue),
+                                    daemon=True)
+                         for i, bucket in enumerate(buckets)]
+            else:
+                procs = [mp.Process(target=_portfolio_worker,
+                                    args=(task_data, args.seed + i, args.debug,
+                                          None, i, result_queue),
+                                    daemon=True)
+                         for i in range(args.workers)]
+
+            engine, assignments, best_skipped = None, None, None
+            for p in procs:
+                p.start()
+            try:
+                for _ in range(len(procs)):
+                    result = result_queue.get()
+                    if result is None:
+                        continue  # that worker errored out
+                    f_engine, f_assignments = result
+                    skipped = len(f_engine.skipped_requirements)
+                    if best_skipped is None or skipped < best_skipped:
+                        engine, assignments, best_skipped = f_engine, f_assignments, skipped
+                    if skipped == 0:
+                        break
+            finally:
+                for p in procs:
+                    p.terminate()
+                for p in procs:
+                    p.join()
+            if engine is None:
+                raise RuntimeError("all portfolio workers failed")
+        else:
+            print(f"[INFO] Initializing solver...")
+            engine = ttv5.TimetableCSPv2(
+                data["timeslots"],
+                data["requirements"],
+                data["days"],
+                data['teacher_availability'],
+                allow_partial=True,
+                debug=args.debug
+            )
+            shadow_proc = None
+            if args.shadow_sac:
+                # Stronger consistency runs off the critical path in its own
+                # process; prunings stream back through the queue
+                import multiprocessing as mp
+                prune_queue = mp.Queue()
+                shadow_proc = mp.Process(target=ttv5.run_shadow_sac,
+                                         args=(data, prune_queue), daemon=True)
+                shadow_proc.start()
+                engine.prune_queue = prune_queue
+
+            print(f"[INFO] Generating timetable...")
+            _pin_to_core(args.seed)
+            try:
+                assignments = engine.solve(seed=args.seed)
+            finally:
+                if shadow_proc is not None:
+                    shadow_proc.terminate()
+
+        # Export (streaming write-only path; memory stays flat on big schedules)
         print(f"[INFO] Exporting to: {args.output_file}")
-        ttv5.export_to_template(
+        if template_source is None:
+            # Map the template instead of buffered reads: warm runs come
+            # straight out of the page cache
+            try:
+                with open(args.template_file, 'rb') as tf:
+                    template_source = io.BytesIO(
+                        mmap.mmap(tf.fileno(), 0, access=mmap.ACCESS_READ))
+            except (OSError, ValueError):
+                template_source = None  # empty/special file: use the path
+        exporter = (ttv5.export_xml_direct if args.fast_xml
+                    else ttv5.export_to_template_streaming)
+        exporter(
             assignments,
             engine,
             data["start_date"],
             data["end_date"],
             args.output_file,
-            args.template_file,
+            template_source if template_source is not None else args.template_file,
             skipped_requirements=engine.skipped_requirements
         )
-        
+
         print(f"[SUCCESS] Timetable generated successfully!")
         print(f"[STATS] Scheduled: {len(assignments)} assignments")
         print(f"[STATS] Unscheduled: {len(engine.skipped_requirements)} requirements")
-        
+
         return 0
-        
+
+    except FileNotFoundError as e:
+        # User error, not a bug: a one-line message beats a stack trace
+        print(f"[ERROR] File not found: {e.filename or e}", file=sys.stderr)
+        return 1
     except Exception as e:
         print(f"[ERROR] {str(e)}", file=sys.stderr)
-        import traceback
-        traceback.print_exc()
+        if args.debug:
+            import traceback
+            traceback.print_exc()
         return 1
 
+def _serve(args, ttv5):
+    """Long-lived worker mode: read one JSON job per stdin line.
+
+    The template is read into memory once and reused across jobs, so
+    repeated invocations (e.g. from a frontend) don't pay the template
+    load or the interpreter/pandas startup per job. Each job is a JSON
+    object whose keys override the CLI defaults (input_file, output_file,
+    seed, ...). One JSON status line is printed per job.
+    """
+    import contextlib
+    import io
+    import json
+
+    with open(args.template_file, 'rb') as f:
+        template_bytes = f.read()
+
+    print("[INFO] Serve mode: one JSON job per line on stdin",
+          file=sys.stderr, flush=True)
+    for line in sys.stdin:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            job = json.loads(line)
+            job_args = argparse.Namespace(**{**vars(args), **job})
+            # Solver chatter goes to stderr while serving so stdout stays
+            # machine-readable: exactly one JSON status line per job
+            with contextlib.redirect_stdout(sys.stderr):
+                rc = _generate(job_args, ttv5,
+                               template_source=io.BytesIO(template_bytes))
+            result = {"status": "ok" if rc == 0 else "error",
+                      "output_file": job_args.output_file}
+        except Exception as e:
+            result = {"status": "error", "error": str(e)}
+        print(json.dumps(result), flush=True)
+    return 0
+
+def main():
+    if os.environ.get('TT_FAST_CLI'):
+        # Trusted-caller fast path for wrappers that always pass the three
+        # paths positionally: skip argparse construction entirely
+        import types
+        args = types.SimpleNamespace(
+            input_file=sys.argv[1], template_file=sys.argv[2], output_file=sys.argv[3],
+            debug=False, max_attempts=200, seed=123,
+            workers=os.cpu_count() or 1, partition=False, no_cache=False,
+            shadow_sac=False, fast_xml=False, precompile=False, serve=False
+        )
+        import ttv5
+        return _generate(args, ttv5)
+
+    parser = argparse.ArgumentParser(description='Generate timetable from Excel input')
+    parser.add_argument('input_file', nargs='?', help='Path to input Excel file (InputData_v2.xlsx)')
+    parser.add_argument('template_file', help='Path to template Excel file (TimeTableImport_SIS.xlsx)')
+    parser.add_argument('output_file', nargs='?', help='Path to output Excel file')
+    parser.add_argument('--debug', action='store_true', help='Enable debug mode')
+    parser.add_argument('--max-attempts', type=int, default=200, help='Max attempts per variable')
+    parser.add_argument('--seed', type=int, default=123, help='Random seed')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help='Portfolio search: solve with N differently-seeded '
+                             'workers and keep the best result (default: CPU count)')
+    parser.add_argument('--partition', action='store_true',
+                        help='With --workers: split the largest domain across workers '
+                             'so each explores a disjoint subtree instead of racing seeds')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Always re-parse the input workbook instead of using '
+                             'the mtime-keyed sidecar cache')
+    parser.add_argument('--shadow-sac', action='store_true',
+                        help='Run a shadow consistency process that prunes provably '
+                             'dead values from the main search (single-worker mode)')
+    parser.add_argument('--fast-xml', action='store_true',
+                        help='Write the output sheet XML directly into the xlsx zip '
+                             '(fastest; omits the Unscheduled sheet)')
+    parser.add_argument('--precompile', action='store_true',
+                        help='Warm the on-disk caches (parsed-input sidecar, template '
+                             'page cache) and exit without generating')
+    parser.add_argument('--serve', action='store_true',
+                        help='Stay alive and read one JSON job per stdin line, '
+                             'reusing the loaded template across jobs '
+                             '(usage: generate_timetable.py TEMPLATE --serve)')
+
+    args = parser.parse_args()
+
+    if args.precompile:
+        if not args.input_file:
+            parser.error('--precompile requires input_file and template_file')
+    elif args.serve:
+        if not args.template_file:
+            parser.error('--serve requires the template_file argument')
+    elif not (args.input_file and args.template_file and args.output_file):
+        parser.error('input_file, template_file and output_file are required')
+
+    # Imported only after the arguments validate: ttv5 drags in pandas and
+    # openpyxl, so --help and usage errors shouldn't pay that import cost
+    import ttv5
+
+    if args.precompile:
+        # One-time warm-up so real runs hit the sidecar cache: re-parse the
+        # input and rewrite its pickle, and pull the template into page cache
+        ttv5.read_input_cached(args.input_file, refresh=True)
+        if args.template_file:
+            with open(args.template_file, 'rb') as f:
+                f.read()
+        print("[INFO] Caches warmed")
+        return 0
+    if args.serve:
+        return _serve(args, ttv5)
+    return _generate(args, ttv5)
+
 if __name__ == "__main__":
     sys.exit(main())
@@ -0,0 +1,57 @@
+"""Subprocess entry point for running the CSP solver off the Streamlit thread.
+
+Lives in its own module (rather than app.py) so worker processes can import
+it regardless of how Streamlit names the script module.
+"""
+import contextlib
+import io
+
+from ttv5 import TimetableCSPv2
+
+
+class QueueWriter(io.TextIOBase):
+    """File-like that forwards everything written to a multiprocessing queue."""
+
+    def __init__(self, queue):
+        self.queue = queue
+
+    def write(self, text):
+        if text:
+            self.queue.put(text)
+        return len(text)
+
+
+def solve_in_subprocess(data, seed, allow_partial, debug, log_queue):
+    """Build the engine and solve inside the worker process.
+
+    Solver output goes to `log_queue` via redirect_stdout (scoped to this
+    process, so the parent's stdout is never touched). Returns
+    (engine, success); the engine carries the assignment and the skipped
+    requirements for the export step.
+    """
+    with contextlib.redirect_stdout(QueueWriter(log_queue)):
+        engine = TimetableCSPv2(
+            timeslots=data["timeslots"],
+            requirements=data["requirements"],
+            days=data["days"],
+            teacher_availability=data["teacher_availability"],
+            allow_partial=allow_partial,
+            debug=debug,
+        )
+        success = engine.solve(seed=seed)
+    return engine, success
+
+
+def solve_to_queue(data, seed, allow_partial, debug, log_queue, result_queue):
+    """multiprocessing.Process entry point for the or-parallel search: run
+    solve_in_subprocess and post its (engine, success) to `result_queue`.
+
+    Posting from a finally block keeps the parent's receive count exact —
+    a worker that errors posts None (its traceback goes to stderr) instead
+    of leaving the parent waiting on a result that never comes.
+    """
+    result = None
+    try:
+        result = solve_in_subprocess(data, seed, allow_partial, debug, log_queue)
+    finally:
+        result_queue.put(result)
@@ -1,12 +1,40 @@
+import numpy as np
 import pandas as pd
 import sys
-sys.setrecursionlimit(20000)
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from functools import lru_cache
 from datetime import datetime, time
 from typing import List, Dict, Tuple, Optional
+import heapq
 import itertools, random, math
 from openpyxl import load_workbook
 
+# ✅ Common 12-hour and 24-hour formats
+_TIME_FORMATS = (
+    "%I:%M %p",    # 12-hour format with minutes (e.g., "01:30 PM")
+    "%I %p",       # 12-hour format without minutes (e.g., "1 PM")
+    "%H:%M",       # 24-hour format (e.g., "13:30")
+    "%H:%M:%S",    # 24-hour with seconds (e.g., "13:30:00")
+)
+_preferred_fmt = _TIME_FORMATS[0]
+
+@lru_cache(maxsize=None)
+def _parse_time_str(s: str) -> time:
+    """Parse a normalized time string; cached because input sheets repeat
+    the same handful of time strings thousands of times."""
+    global _preferred_fmt
+    # One workbook sticks to one format, so try the last one that worked
+    # before falling back to the full list
+    for fmt in (_preferred_fmt, *(f for f in _TIME_FORMATS if f != _preferred_fmt)):
+        try:
+            parsed = datetime.strptime(s, fmt).time()
+            _preferred_fmt = fmt
+            return parsed
+        except ValueError:
+            continue
+    # ✅ Fallback to pandas parser (handles edge cases)
+    return pd.to_datetime(s).time()
+
 def parse_time(val) -> time:
     """
     Parse time values in both 12-hour (e.g., '01:30 PM') and 24-hour (e.g., '13:30')
@@ -24,23 +52,8 @@ def parse_time(val) -> time:
 
     s = str(val).strip().upper().replace('.', ':')  # normalize '1.30 PM' -> '1:30 PM'
 
-    # ✅ Try common 12-hour and 24-hour formats
-    time_formats = [
-        "%I:%M %p",    # 12-hour format with minutes (e.g., "01:30 PM")
-        "%I %p",       # 12-hour format without minutes (e.g., "1 PM")
-        "%H:%M",       # 24-hour format (e.g., "13:30")
-        "%H:%M:%S",    # 24-hour with seconds (e.g., "13:30:00")
-    ]
-
-    for fmt in time_formats:
-        try:
-            return datetime.strptime(s, fmt).time()
-        except ValueError:
-            continue
-
-    # ✅ Fallback to pandas parser (handles edge cases)
     try:
-        return pd.to_datetime(s).time()
+        return _parse_time_str(s)
     except Exception:
         raise ValueError(f"Invalid time format: {val!r}. Expected HH:MM / HH:MM:SS / HH:MM AM/PM")
 
@@ -49,19 +62,26 @@ def parse_time(val) -> time:
 def time_to_minutes(t: time) -> int:
     return t.hour * 60 + t.minute
 
-def overlap(a_start: time, a_end: time, b_start: time, b_end: time) -> bool:
+def overlap(a_start: int, a_end: int, b_start: int, b_end: int) -> bool:
     return max(a_start, b_start) < min(a_end, b_end)
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Timeslot:
     id: str
     start: time
     end: time
-    @property
-    def duration_min(self) -> int:
-        return time_to_minutes(self.end) - time_to_minutes(self.start)
-
-@dataclass
+    # Minute-of-day equivalents, resolved once at construction so hot loops
+    # compare plain ints instead of time objects
+    start_min: int = field(init=False)
+    end_min: int = field(init=False)
+    duration_min: int = field(init=False)
+
+    def __post_init__(self):
+        object.__setattr__(self, 'start_min', time_to_minutes(self.start))
+        object.__setattr__(self, 'end_min', time_to_minutes(self.end))
+        object.__setattr__(self, 'duration_min', self.end_min - self.start_min)
+
+@dataclass(slots=True)
 class Requirement:
     course_code: str
     curriculum: str
@@ -71,7 +91,14 @@ class Requirement:
     slots_required: int
     min_total_hours: float
     available_rooms: List[str]  # comma-split in input; empty means no room assignment
-    
+    # Hour target in minutes, resolved once so feasibility checks stop
+    # doing float-to-int arithmetic per candidate
+    min_total_minutes: int = field(init=False)
+
+    def __post_init__(self):
+        self.min_total_minutes = int(self.min_total_hours * 60)
+
+
 class TimetableCSPv2:
     def __init__(self, timeslots: List[Timeslot], requirements: List[Requirement], days: List[str], teacher_availability=None, allow_partial=False, debug=False):
         self.timeslots = timeslots
@@ -137,29 +164,76 @@ class TimetableCSPv2:
             for i in range(req.slots_required):
                 self.variables.append((req.course_code, req.section_id, i))
 
-        # Domains: each var can be placed on (day, slot_id, room_choice)
-        self.domains: Dict[Tuple[str,str,int], List[Tuple[str,str,str]]] = {}
+        # Domains: each var can be placed on (day, slot_id, room_choice).
+        # A domain is fully determined by (teacher, rooms), so variables of
+        # the same requirement — and different requirements taught by the
+        # same teacher in the same rooms — share one tuple instead of each
+        # materializing its own days x slots x rooms product.
+        self.domains: Dict[Tuple[str,str,int], Tuple[Tuple[str,str,str], ...]] = {}
+        domain_cache: Dict[Tuple[str, Tuple[str, ...]], Tuple[Tuple[str,str,str], ...]] = {}
         for var in self.variables:
             c, s, _ = var
             req = self.req_index[(c, s)]
             rooms = req.available_rooms if req.available_rooms else [""]
-            day_slot_pairs = list(itertools.product(self.days, [ts.id for ts in self.timeslots]))
-            # Filter by teacher availability if specified for this teacher
-            if req.teacher in self.allowed_teacher_pairs:
-                allowed = self.allowed_teacher_pairs[req.teacher]
-                day_slot_pairs = [p for p in day_slot_pairs if p in allowed]
-            combos = list(itertools.product(day_slot_pairs, rooms))
-            self.domains[var] = [(d, sid, r) for ((d, sid), r) in combos]
+            cache_key = (req.teacher, tuple(rooms))
+            dom = domain_cache.get(cache_key)
+            if dom is None:
+                day_slot_pairs = list(itertools.product(self.days, [ts.id for ts in self.timeslots]))
+                # Filter by teacher availability if specified for this teacher
+                if req.teacher in self.allowed_teacher_pairs:
+                    allowed = self.allowed_teacher_pairs[req.teacher]
+                    day_slot_pairs = [p for p in day_slot_pairs if p in allowed]
+                combos = itertools.product(day_slot_pairs, rooms)
+                dom = tuple((d, sid, r) for ((d, sid), r) in combos)
+                domain_cache[cache_key] = dom
+            self.domains[var] = dom
 
         self.ts_by_id: Dict[str, Timeslot] = {ts.id: ts for ts in self.timeslots}
-        # Precompute max slot duration once
+        # Precompute per-slot durations and max slot duration once, so the
+        # hot path never goes back through ts_by_id for arithmetic
+        self.dur_by_id: Dict[str, int] = {ts.id: ts.duration_min for ts in self.timeslots}
         self.max_slot_minutes = max((t.duration_min for t in self.timeslots), default=0)
-        # Overlap by time (day handled in occupancy maps)
+        # Overlap by time (day handled in occupancy maps). Each slot owns a
+        # bit; conflict_mask[slot] has a bit set for every overlapping slot
+        # (itself included), so clash tests are a single AND against an
+        # occupancy bitmask instead of a set scan.
+        self.slot_bit: Dict[str, int] = {ts.id: 1 << i for i, ts in enumerate(self.timeslots)}
         self.conflicts: Dict[str, set] = {ts.id: {ts.id} for ts in self.timeslots}
-        for a, b in itertools.combinations(self.timeslots, 2):
-            if overlap(a.start, a.end, b.start, b.end):
+        # Sweep over slots sorted by start time: a later slot can only
+        # overlap `a` while it starts before `a` ends, so each pair beyond
+        # that is skipped instead of tested (vs. all-pairs combinations)
+        by_start = sorted(self.timeslots, key=lambda t: t.start_min)
+        for i, a in enumerate(by_start):
+            for b in by_start[i+1:]:
+                if b.start_min >= a.end_min:
+                    break
                 self.conflicts[a.id].add(b.id)
                 self.conflicts[b.id].add(a.id)
+        self.conflict_mask: Dict[str, int] = {
+            sid: sum(self.slot_bit[other] for other in conf)
+            for sid, conf in self.conflicts.items()
+        }
+
+        # Bitmask view of each domain: per (day, room), the mask of slots the
+        # variable may use. MRV counts surviving values with ANDs and
+        # popcounts over these instead of testing every value individually.
+        self._conflict_by_bit: Dict[int, int] = {
+            self.slot_bit[sid]: mask for sid, mask in self.conflict_mask.items()
+        }
+        self._expand_cache: Dict[int, int] = {0: 0}
+        self.domain_masks: Dict[Tuple[str,str,int], Dict[Tuple[str,str], int]] = {}
+        mask_cache: Dict[int, Dict[Tuple[str,str], int]] = {}
+        for var, dom in self.domains.items():
+            # Shared domains (same tuple object) share one mask dict too;
+            # neither is mutated after construction
+            masks = mask_cache.get(id(dom))
+            if masks is None:
+                masks = {}
+                for (d, sid, r) in dom:
+                    key = (d, r)
+                    masks[key] = masks.get(key, 0) | self.slot_bit[sid]
+                mask_cache[id(dom)] = masks
+            self.domain_masks[var] = masks
 
         # Early domain emptiness check (fast fail)
         for var, dom in self.domains.items():
@@ -172,59 +246,141 @@ class TimetableCSPv2:
 
         self.assignment: Dict[Tuple[str,str,int], Tuple[str,str,str]] = {}
         self.partial_minutes: Dict[Tuple[str,str], int] = {(c,s):0 for (c,s) in self.req_index.keys()}
-
-        # Day-wise occupancy to avoid clashes
-        self.section_busy = {d: {} for d in self.days}  # day -> section -> set(slot_ids)
-        self.teacher_busy = {d: {} for d in self.days}  # day -> teacher -> set(slot_ids)
-        self.room_busy    = {d: {} for d in self.days}  # day -> room -> set(slot_ids)
-
-    def _is_virtual_room(self, room: str) -> bool:
-        """Check if a room is virtual/online (no physical capacity limit)"""
+        # Assignments placed so far per requirement, maintained by
+        # _place/_remove so _is_feasible never scans the whole assignment
+        self.req_assigned: Dict[Tuple[str,str], int] = {(c,s):0 for (c,s) in self.req_index.keys()}
+
+        # Day-wise occupancy to avoid clashes (bitmask of occupied slot bits)
+        self.section_busy = {d: {} for d in self.days}  # day -> section -> int mask
+        self.teacher_busy = {d: {} for d in self.days}  # day -> teacher -> int mask
+        self.room_busy    = {d: {} for d in self.days}  # day -> room -> int mask
+        # How many occupancies (section + teacher + room) use each slot per
+        # day, maintained by _place/_remove so the LCV load heuristic reads
+        # one counter instead of scanning every busy mask
+        self.slot_load = {d: {} for d in self.days}     # day -> slot_id -> int count
+
+        # The room universe is fixed by the requirements, so resolve the
+        # virtual-room keyword scan once per room instead of on every
+        # feasibility check / placement
+        self._virtual_room: Dict[str, bool] = {}
+        for req in requirements:
+            for r in (req.available_rooms or []):
+                if r not in self._virtual_room:
+                    self._virtual_room[r] = self._check_virtual_room(r)
+
+        # Requirements that can constrain each other: same teacher, same
+        # (curriculum, section), or a shared physical room. Forward checking
+        # only needs to re-count these after a placement, not every
+        # requirement. Each requirement neighbors itself (remaining sessions).
+        by_teacher: Dict[str, list] = {}
+        by_sec: Dict[Tuple[str, str], list] = {}
+        by_room: Dict[str, list] = {}
+        for key, req in self.req_index.items():
+            by_teacher.setdefault(req.teacher, []).append(key)
+            by_sec.setdefault((req.curriculum, req.section_id), []).append(key)
+            for r in (req.available_rooms or []):
+                if not self._virtual_room[r]:
+                    by_room.setdefault(r, []).append(key)
+        neigh = {key: {key} for key in self.req_index}
+        for group in itertools.chain(by_teacher.values(), by_sec.values(), by_room.values()):
+            if len(group) > 1:
+                group_set = set(group)
+                for key in group:
+                    neigh[key] |= group_set
+        self.req_neighbors: Dict[Tuple[str, str], Tuple[Tuple[str, str], ...]] = {
+            key: tuple(others) for key, others in neigh.items()
+        }
+
+        # Partial evaluation of the hot path for this instance: when the
+        # problem has no virtual rooms at all, the keyword test in
+        # _place/_remove can never fire, and _is_feasible is rebuilt as a
+        # closure over the constraint structures (see _build_is_feasible)
+        if not any(self._virtual_room.values()):
+            self._is_virtual_room = lambda room: False
+        self._is_feasible = self._build_is_feasible()
+
+    @staticmethod
+    def _check_virtual_room(room: str) -> bool:
+        """Keyword scan behind _is_virtual_room; runs once per distinct room."""
         if not room:
             return False
         room_lower = room.lower().strip()
         # List of keywords that indicate virtual/online rooms
         virtual_keywords = ['online', 'virtual', 'zoom', 'teams', 'meet', 'webex', 'remote']
         return any(keyword in room_lower for keyword in virtual_keywords)
+
+    def _is_virtual_room(self, room: str) -> bool:
+        """Check if a room is virtual/online (no physical capacity limit)"""
+        cached = self._virtual_room.get(room)
+        if cached is None:
+            cached = self._virtual_room[room] = self._check_virtual_room(room)
+        return cached
     
-    def _is_feasible(self, var, val) -> bool:
-        c, s, _ = var
-        day, slot_id, room = val
-        req = self.req_index[(c, s)]
-        ts = self.ts_by_id[slot_id]
-        curriculum = req.curriculum
+    def _build_is_feasible(self):
+        """Build this instance's _is_feasible, specialized to its constraints.
+
+        The constraint structures are bound as closure locals (they are
+        mutated in place but never rebound), removing the attribute lookups
+        the generic method paid per candidate, and the virtual-room branch
+        is emitted only when the problem actually contains virtual rooms.
+        Teacher availability needs no check at all here: domains were
+        already restricted to allowed_teacher_pairs in __init__, and
+        candidates only ever come from the domains.
+        """
+        req_index = self.req_index
+        conflict_mask = self.conflict_mask
+        section_busy = self.section_busy
+        teacher_busy = self.teacher_busy
+        room_busy = self.room_busy
+        req_assigned = self.req_assigned
+        partial_minutes = self.partial_minutes
+        dur_by_id = self.dur_by_id
+        max_slot = self.max_slot_minutes
+        virtual_room = self._virtual_room
+        any_virtual = any(virtual_room.values())
 
-        available_periods = self.teacher_availability.get(req.teacher, [])
-        if available_periods:
-            fits = any(
-                day == ap[0] and ts.start >= ap[1] and ts.end <= ap[2]
-                for ap in available_periods
-            )
-            if not fits:
-                return False
+        def _is_feasible(var, val) -> bool:
+            c, s, _ = var
+            day, slot_id, room = val
+            req = req_index[(c, s)]
 
-        # Section clash (curriculum-aware)
-        for used_slot in self.section_busy[day].get((curriculum, s), set()):
-            if slot_id in self.conflicts[used_slot]:
+            cmask = conflict_mask[slot_id]
+            # Section clash (curriculum-aware)
+            if cmask & section_busy[day].get((req.curriculum, s), 0):
                 return False
-        # Teacher clash (GLOBAL: a teacher cannot teach two places at once)
-        for used_slot in self.teacher_busy[day].get(req.teacher, set()):
-            if slot_id in self.conflicts[used_slot]:
+            # Teacher clash (GLOBAL: a teacher cannot teach two places at once)
+            if cmask & teacher_busy[day].get(req.teacher, 0):
                 return False
-        # Room clash (GLOBAL: a room cannot host two classes at once)
-        # EXCEPTION: Virtual/online rooms can host unlimited classes simultaneously
-        if room and not self._is_virtual_room(room):
-            for used_slot in self.room_busy[day].get(room, set()):
-                if slot_id in self.conflicts[used_slot]:
+            # Room clash (GLOBAL: a room cannot host two classes at once)
+            # EXCEPTION: Virtual/online rooms can host unlimited classes simultaneously
+            if room and not (any_virtual and virtual_room.get(room, False)):
+                if cmask & room_busy[day].get(room, 0):
                     return False
 
-        # Duration feasibility
-        assigned_count = sum(1 for v in self.assignment if v[0]==c and v[1]==s)
-        remaining = self.req_index[(c,s)].slots_required - assigned_count - 1
-        max_slot = self.max_slot_minutes
-        min_needed = int(self.req_index[(c,s)].min_total_hours * 60)
-        future_possible = self.partial_minutes[(c,s)] + ts.duration_min + remaining * max_slot
-        return future_possible >= min_needed
+            # Duration feasibility
+            remaining = req.slots_required - req_assigned[(c,s)] - 1
+            future_possible = partial_minutes[(c,s)] + dur_by_id[slot_id] + remaining * max_slot
+            return future_possible >= req.min_total_minutes
+
+        if not any_virtual:
+            def _is_feasible(var, val) -> bool:  # noqa: F811 - specialized variant
+                c, s, _ = var
+                day, slot_id, room = val
+                req = req_index[(c, s)]
+
+                cmask = conflict_mask[slot_id]
+                if cmask & section_busy[day].get((req.curriculum, s), 0):
+                    return False
+                if cmask & teacher_busy[day].get(req.teacher, 0):
+                    return False
+                if room and cmask & room_busy[day].get(room, 0):
+                    return False
+
+                remaining = req.slots_required - req_assigned[(c,s)] - 1
+                future_possible = partial_minutes[(c,s)] + dur_by_id[slot_id] + remaining * max_slot
+                return future_possible >= req.min_total_minutes
+
+        return _is_feasible
 
     def _place(self, var, val):
         # confirms the assignment is okay, during backtracking search
@@ -234,13 +390,18 @@ class TimetableCSPv2:
         curriculum = req.curriculum
 
         self.assignment[var] = val
-        self.partial_minutes[(c,s)] += self.ts_by_id[slot_id].duration_min
+        self.partial_minutes[(c,s)] += self.dur_by_id[slot_id]
+        self.req_assigned[(c,s)] += 1
 
-        self.section_busy[day].setdefault((curriculum, s), set()).add(slot_id)
-        self.teacher_busy[day].setdefault(req.teacher, set()).add(slot_id)
+        bit = self.slot_bit[slot_id]
+        self.section_busy[day][(curriculum, s)] = self.section_busy[day].get((curriculum, s), 0) | bit
+        self.teacher_busy[day][req.teacher] = self.teacher_busy[day].get(req.teacher, 0) | bit
+        occupancies = 2
         # Only track physical room occupancy (virtual rooms have unlimited capacity)
         if room and not self._is_virtual_room(room):
-            self.room_busy[day].setdefault(room, set()).add(slot_id)
+            self.room_busy[day][room] = self.room_busy[day].get(room, 0) | bit
+            occupancies = 3
+        self.slot_load[day][slot_id] = self.slot_load[day].get(slot_id, 0) + occupancies
     
     def _remove(self, var, val):
         # undoes the assignment, during backtracking search
@@ -250,45 +411,131 @@ class TimetableCSPv2:
         curriculum = req.curriculum
 
         del self.assignment[var]
-        self.partial_minutes[(c,s)] -= self.ts_by_id[slot_id].duration_min
+        self.partial_minutes[(c,s)] -= self.dur_by_id[slot_id]
+        self.req_assigned[(c,s)] -= 1
 
-        self.section_busy[day][(curriculum, s)].remove(slot_id)
+        bit = self.slot_bit[slot_id]
+        self.section_busy[day][(curriculum, s)] &= ~bit
         if not self.section_busy[day][(curriculum, s)]:
             del self.section_busy[day][(curriculum, s)]
 
-        self.teacher_busy[day][req.teacher].remove(slot_id)
+        self.teacher_busy[day][req.teacher] &= ~bit
         if not self.teacher_busy[day][req.teacher]:
             del self.teacher_busy[day][req.teacher]
 
+        occupancies = 2
         # Only remove physical room occupancy (virtual rooms aren't tracked)
         if room and not self._is_virtual_room(room):
-            self.room_busy[day][room].remove(slot_id)
+            self.room_busy[day][room] &= ~bit
             if not self.room_busy[day][room]:
                 del self.room_busy[day][room]
+            occupancies = 3
+        self.slot_load[day][slot_id] -= occupancies
+        if not self.slot_load[day][slot_id]:
+            del self.slot_load[day][slot_id]
+
+    def _blocked_from(self, busy_mask):
+        """Expand an occupancy mask to the mask of all slots it conflicts with.
+
+        Memoized on the busy mask value, which repeats heavily during search.
+        """
+        blocked = self._expand_cache.get(busy_mask)
+        if blocked is None:
+            blocked, m = 0, busy_mask
+            while m:
+                low = m & -m
+                blocked |= self._conflict_by_bit[low]
+                m ^= low
+            self._expand_cache[busy_mask] = blocked
+        return blocked
+
+    def _count_feasible(self, var, bound=None):
+        """Count feasible values for `var` via mask arithmetic (no per-value loop).
+
+        With `bound`, counting stops as soon as the total reaches it: MRV
+        only needs to know whether this variable beats the current best, so
+        wide domains don't get counted to the end.
+        """
+        c, s, _ = var
+        req = self.req_index[(c, s)]
+
+        # Duration feasibility depends only on the candidate slot's length;
+        # compute the set of slot durations that keep the hour target reachable
+        remaining = req.slots_required - self.req_assigned[(c, s)] - 1
+        base = self.partial_minutes[(c, s)] + remaining * self.max_slot_minutes
+        min_needed = req.min_total_minutes
+        dur_mask = 0
+        for ts in self.timeslots:
+            if base + ts.duration_min >= min_needed:
+                dur_mask |= self.slot_bit[ts.id]
+        if not dur_mask:
+            return 0
+
+        total = 0
+        for (day, room), static_mask in self.domain_masks[var].items():
+            m = static_mask & dur_mask
+            if not m:
+                continue
+            blocked = self._blocked_from(self.section_busy[day].get((req.curriculum, s), 0))
+            blocked |= self._blocked_from(self.teacher_busy[day].get(req.teacher, 0))
+            if room and not self._is_virtual_room(room):
+                blocked |= self._blocked_from(self.room_busy[day].get(room, 0))
+            total += (m & ~blocked).bit_count()
+            if bound is not None and total >= bound:
+                return total
+        return total
+
+    def _forward_check(self, var) -> bool:
+        """After placing `var`, verify no related requirement lost its last
+        feasible value.
+
+        Feasibility counts are derived from the occupancy masks on the fly,
+        so failing here needs no undo trail: the caller just retracts the
+        placement. Counts don't depend on the session index, so one probe
+        per neighboring requirement suffices.
+        """
+        for key in self.req_neighbors.get(var[:2], ()):
+            if self.req_assigned[key] >= self.req_index[key].slots_required:
+                continue  # fully placed, nothing left to wipe out
+            probe = (key[0], key[1], 0)
+            if probe in self.skipped_vars:
+                continue
+            if self._count_feasible(probe, bound=1) == 0:
+                return False
+        return True
 
     def _mrv(self): # Implements the Minimum Remaining Values
         best, best_size = None, math.inf
         # Get skipped vars if in partial mode
         skipped = getattr(self, 'skipped_vars', set())
-        
+
         for var in self.variables:
             if var in self.assignment or var in skipped:
                 continue
-            feasible_count = 0
-            for val in self.domains[var]:
-                if self._is_feasible(var, val):
-                    feasible_count += 1
+            # Counting past the current best can't change the choice
+            feasible_count = self._count_feasible(var, bound=best_size)
             if feasible_count < best_size:
                 best, best_size = var, feasible_count
-                if best_size == 0:
+                if best_size <= 1:
+                    # 0 is a dead end and 1 is forced either way; nothing
+                    # later in the scan can improve on those
                     break
         return best
 
-    def _order_values(self, var, candidates):
+    def _iter_ordered_values(self, var, candidates, limit=None):
         # Heuristic:
         # 1) Prefer days NOT already used by this course-section (spread across days)
         # 2) Prefer slots with fewer conflicts
         # 3) Prefer earlier in the week/day
+        #
+        # Yields candidates best-first instead of returning a sorted list:
+        # the keys are packed into one order-isomorphic integer each and
+        # heapified (O(n)); ordering the tail is only paid for if the search
+        # actually comes back for it, and deep in the search the first
+        # candidate usually sticks.
+        if not candidates:
+            return
+
         c, s, slot_idx = var
         req = self.req_index[(c, s)]
 
@@ -301,142 +548,186 @@ class TimetableCSPv2:
                 used_days.add(val[0])  # val[0] is day
 
         def total_load(day, slot_id):
-            # count how many occupancies currently use this slot_id on this day
-            sec_load = sum(1 for used in self.section_busy[day].values() if slot_id in used)
-            tch_load = sum(1 for used in self.teacher_busy[day].values() if slot_id in used)
-            rm_load = sum(1 for used in self.room_busy[day].values() if slot_id in used)
-            return sec_load + tch_load + rm_load
+            # how many occupancies currently use this slot_id on this day
+            # (maintained incrementally by _place/_remove)
+            return self.slot_load[day].get(slot_id, 0)
 
         def static_conflicts(day, slot_id, room):
             # rough estimate: overlaps with already used slots for this section/teacher/room on the same day
-            sec_conf = sum(1 for used in self.section_busy[day].get((req.curriculum, s), set()) if slot_id in self.conflicts[used])
-            teach_conf = sum(1 for used in self.teacher_busy[day].get(req.teacher, set()) if slot_id in self.conflicts[used])
+            cmask = self.conflict_mask[slot_id]
+            sec_conf = (cmask & self.section_busy[day].get((req.curriculum, s), 0)).bit_count()
+            teach_conf = (cmask & self.teacher_busy[day].get(req.teacher, 0)).bit_count()
             room_conf = 0
             if room:
-                room_conf = sum(1 for used in self.room_busy[day].get(room, set()) if slot_id in self.conflicts[used])
+                room_conf = (cmask & self.room_busy[day].get(room, 0)).bit_count()
             return sec_conf + teach_conf + room_conf
 
-        def score(val):
-            day, slot_id, room = val
-            ts = self.ts_by_id[slot_id]
+        # Build one integer array per sort key in a single pass, most
+        # significant first
+        day_used_key, conf_key, load_key, rank_key, start_key = [], [], [], [], []
+        for (day, slot_id, room) in candidates:
             # Prefer days NOT already used (0 if new day, 1 if already used)
-            day_already_used = 1 if day in used_days else 0
-            return (
-                day_already_used,                         # NEW: prefer different days (0 < 1)
-                static_conflicts(day, slot_id, room),     # fewer conflicts first
-                total_load(day, slot_id),                 # lower load better
-                day_rank.get(day, 999),                   # earlier day
-                ts.start                                  # earlier time
-            )
+            day_used_key.append(1 if day in used_days else 0)
+            conf_key.append(static_conflicts(day, slot_id, room))  # fewer conflicts first
+            load_key.append(total_load(day, slot_id))              # lower load better
+            rank_key.append(day_rank.get(day, 999))                # earlier day
+            start_key.append(self.ts_by_id[slot_id].start_min)     # earlier time
+
+        keys = [np.asarray(k, dtype=np.int64)
+                for k in (day_used_key, conf_key, load_key, rank_key, start_key)]
+        composite = keys[0]
+        for arr in keys[1:]:
+            composite = composite * (int(arr.max()) + 1) + arr
+
+        # (packed key, index) pairs tie-break on index, matching what a
+        # stable sort over the original candidate order would produce
+        heap = [(k, i) for i, k in enumerate(composite.tolist())]
+        heapq.heapify(heap)
+        remaining = len(heap) if limit is None else min(limit, len(heap))
+        for _ in range(remaining):
+            _, i = heapq.heappop(heap)
+            yield candidates[i]
+
+    def _open_frame(self, max_attempts_per_var):
+        """Pick the next variable and build its search frame.
+
+        Returns True when the (possibly partial) assignment is complete,
+        False on a dead end, or a [var, candidate_iterator, placed_val]
+        frame for _backtrack to push. Loops internally because skipping an
+        over-constrained requirement just means choosing again.
+        """
+        while True:
+            non_skipped_vars = [v for v in self.variables if v not in self.skipped_vars]
+            assigned_count = len([v for v in non_skipped_vars if v in self.assignment])
+
+            if assigned_count == len(non_skipped_vars):
+                # final check: min hours for non-skipped requirements
+                for (c, s), req in self.req_index.items():
+                    # Skip if this requirement was skipped
+                    if any(v for v in self.skipped_vars if v[0] == c and v[1] == s):
+                        continue
+                    if self.partial_minutes[(c, s)] < req.min_total_minutes:
+                        return False
+                return True
 
-        return sorted(candidates, key=score)
+            var = self._mrv()
+            # Progress tracking
+            if assigned_count % 10 == 0 and assigned_count != getattr(self, '_last_progress', -1):
+                print(f"[PROGRESS] Assigned {assigned_count}/{len(non_skipped_vars)} variables")
+                self._last_progress = assigned_count
 
-    def _backtrack(self, max_attempts_per_var=1000) -> bool:
-        # Count only non-skipped variables
-        if not hasattr(self, 'skipped_vars'):
-            self.skipped_vars = set()
-        
-        non_skipped_vars = [v for v in self.variables if v not in self.skipped_vars]
-        assigned_count = len([v for v in non_skipped_vars if v in self.assignment])
-        
-        if assigned_count == len(non_skipped_vars):
-            # final check: min hours for non-skipped requirements
-            for (c, s), req in self.req_index.items():
-                # Skip if this requirement was skipped
-                if any(v for v in self.skipped_vars if v[0] == c and v[1] == s):
-                    continue
-                if self.partial_minutes[(c, s)] < int(req.min_total_hours*60):
-                    return False
-            return True
+            if var is None:
+                # In partial mode, if no variable found but we have skipped some, that's ok
+                return bool(self.allow_partial and self.skipped_vars)
 
-        var = self._mrv()
-        # Progress tracking
-        if assigned_count % 10 == 0 and assigned_count != getattr(self, '_last_progress', -1):
-            print(f"[PROGRESS] Assigned {assigned_count}/{len(non_skipped_vars)} variables")
-            self._last_progress = assigned_count
+            self.attempt_count[var] = self.attempt_count.get(var, 0) + 1
 
-        if var is None:
-            # In partial mode, if no variable found but we have skipped some, that's ok
-            if self.allow_partial and self.skipped_vars:
-                return True
-            return False
-            
-        # Track attempts per variable
-        if not hasattr(self, 'attempt_count'):
-            self.attempt_count = {}
-        self.attempt_count[var] = self.attempt_count.get(var, 0) + 1
-        
-        # Debug: Show which requirement is being processed
-        if self.debug and self.attempt_count[var] == 1:
-            c, s, i = var
-            req = self.req_index[(c, s)]
-            print(f"[DEBUG] Processing: course={req.course_code} section={req.section_id} teacher={req.teacher} slot_index={i}/{req.slots_required}")
-        
-        # Debug: Warn if taking many attempts
-        if self.debug and self.attempt_count[var] in [100, 250, 400]:
-            c, s, i = var
-            req = self.req_index[(c, s)]
-            print(f"[DEBUG] Struggling with: course={req.course_code} section={req.section_id} teacher={req.teacher} (attempt {self.attempt_count[var]})")
-        
-        # If stuck on a variable for too long in partial mode, skip it
-        if self.allow_partial and self.attempt_count[var] > max_attempts_per_var:
-            c, s, i = var
-            req = self.req_index[(c, s)]
-            
-            # Determine reason for failure
-            feasible = [v for v in self.domains[var] if self._is_feasible(var, v)]
-            if len(feasible) == 0:
-                reason = "No feasible timeslots available (teacher busy, section conflict, or room occupied)"
-            else:
-                reason = f"Could not place after {max_attempts_per_var} attempts (likely over-constrained or conflicting requirements)"
-            
-            # Skip all slots for this requirement
-            req_key = (c, s)
-            if req_key not in [r[0] for r in self.skipped_requirements]:
-                self.skipped_requirements.append((req, reason))
-                print(f"[SKIP] course={c} section={s} teacher={req.teacher}: {reason}")
-            
-            # Mark all variables for this requirement as skipped
-            vars_to_skip = [(cc, ss, ii) for (cc, ss, ii) in self.variables if cc == c and ss == s]
-            for v in vars_to_skip:
-                self.skipped_vars.add(v)
-            
-            return self._backtrack(max_attempts_per_var)  # Continue with next variable
-
-        if var is None:
-            return False
+            # Debug: Show which requirement is being processed
+            if self.debug and self.attempt_count[var] == 1:
+                c, s, i = var
+                req = self.req_index[(c, s)]
+                print(f"[DEBUG] Processing: course={req.course_code} section={req.section_id} teacher={req.teacher} slot_index={i}/{req.slots_required}")
 
-        candidates = [v for v in self.domains[var] if self._is_feasible(var, v)]
-        # In partial mode with large datasets, if no candidates, skip immediately
-        if self.allow_partial and len(candidates) == 0:
-            c, s, i = var
-            req = self.req_index[(c, s)]
-            req_key = (c, s)
-            if req_key not in [r[0] for r in self.skipped_requirements]:
-                self.skipped_requirements.append((req, "No feasible timeslots available (teacher busy, section conflict, or room occupied)"))
-                print(f"[SKIP] course={req.course_code} section={req.section_id} teacher={req.teacher}: No feasible slots")
-            vars_to_skip = [(cc, ss, ii) for (cc, ss, ii) in self.variables if cc == c and ss == s]
-            for v in vars_to_skip:
-                self.skipped_vars.add(v)
-            return self._backtrack(max_attempts_per_var)
-        
-        # Order values by LCV to reduce backtracking
-        candidates = self._order_values(var, candidates)
-        
-        # For large datasets, limit candidate exploration to top 20 options
-        if self.allow_partial and len(candidates) > 20:
-            if self.debug:
+            # Debug: Warn if taking many attempts
+            if self.debug and self.attempt_count[var] in [100, 250, 400]:
+                c, s, i = var
+                req = self.req_index[(c, s)]
+                print(f"[DEBUG] Struggling with: course={req.course_code} section={req.section_id} teacher={req.teacher} (attempt {self.attempt_count[var]})")
+
+            # If stuck on a variable for too long in partial mode, skip it
+            if self.allow_partial and self.attempt_count[var] > max_attempts_per_var:
+                c, s, i = var
+                req = self.req_index[(c, s)]
+
+                # Determine reason for failure
+                feasible = [v for v in self.domains[var] if self._is_feasible(var, v)]
+                if len(feasible) == 0:
+                    reason = "No feasible timeslots available (teacher busy, section conflict, or room occupied)"
+                else:
+                    reason = f"Could not place after {max_attempts_per_var} attempts (likely over-constrained or conflicting requirements)"
+
+                # Skip all slots for this requirement
+                req_key = (c, s)
+                if req_key not in [r[0] for r in self.skipped_requirements]:
+                    self.skipped_requirements.append((req, reason))
+                    print(f"[SKIP] course={c} section={s} teacher={req.teacher}: {reason}")
+
+                # Mark all variables for this requirement as skipped
+                vars_to_skip = [(cc, ss, ii) for (cc, ss, ii) in self.variables if cc == c and ss == s]
+                for v in vars_to_skip:
+                    self.skipped_vars.add(v)
+
+                continue  # Continue with next variable
+
+            candidates = [v for v in self.domains[var] if self._is_feasible(var, v)]
+            # In partial mode with large datasets, if no candidates, skip immediately
+            if self.allow_partial and len(candidates) == 0:
                 c, s, i = var
                 req = self.req_index[(c, s)]
-                print(f"[DEBUG] Limiting candidates from {len(candidates)} to 20 for: course={req.course_code} section={req.section_id}")
-            candidates = candidates[:20]
+                req_key = (c, s)
+                if req_key not in [r[0] for r in self.skipped_requirements]:
+                    self.skipped_requirements.append((req, "No feasible timeslots available (teacher busy, section conflict, or room occupied)"))
+                    print(f"[SKIP] course={req.course_code} section={req.section_id} teacher={req.teacher}: No feasible slots")
+                vars_to_skip = [(cc, ss, ii) for (cc, ss, ii) in self.variables if cc == c and ss == s]
+                for v in vars_to_skip:
+                    self.skipped_vars.add(v)
+                continue
 
-        for val in candidates:
+            # Order values by LCV to reduce backtracking; for large datasets
+            # in partial mode, only the top 20 options are explored. The
+            # frame holds the lazy best-first iterator directly, so ordering
+            # beyond the values actually tried is never computed.
+            limit = 20 if self.allow_partial else None
+            if limit is not None and self.debug and len(candidates) > limit:
+                c, s, i = var
+                req = self.req_index[(c, s)]
+                print(f"[DEBUG] Limiting candidates from {len(candidates)} to {limit} for: course={req.course_code} section={req.section_id}")
+
+            return [var, self._iter_ordered_values(var, candidates, limit=limit), None]
+
+    def _backtrack(self, max_attempts_per_var=1000) -> bool:
+        # Explicit DFS stack instead of recursion: deep schedules used to
+        # need sys.setrecursionlimit(20000) and each node paid a Python
+        # call frame. Each stack entry is [var, candidate_iterator,
+        # placed_val]; placed_val records what to undo before trying the
+        # next candidate. Skips (skipped_vars) are permanent, exactly as in
+        # the recursive version, so they are never unwound.
+        if not hasattr(self, 'skipped_vars'):
+            self.skipped_vars = set()
+        if not hasattr(self, 'attempt_count'):
+            self.attempt_count = {}
+
+        frame = self._open_frame(max_attempts_per_var)
+        if frame is True or frame is False:
+            return frame
+        stack = [frame]
+        while stack:
+            frame = stack[-1]
+            var, candidates, placed = frame
+            if placed is not None:
+                # Returning to this frame means the subtree below `placed`
+                # failed: undo it before trying the next candidate
+                self._remove(var, placed)
+                frame[2] = None
+            val = next(candidates, None)
+            if val is None:
+                stack.pop()  # exhausted: fail upward
+                continue
             self._place(var, val)
-            if self._backtrack():
+            frame[2] = val
+            # Forward checking: a placement that strips some requirement's
+            # last feasible value can't lead anywhere, so fail it here
+            # instead of discovering the wipeout levels deeper. Only in
+            # strict mode — under allow_partial a wiped-out requirement is
+            # legitimately skipped rather than fatal.
+            if not self.allow_partial and not self._forward_check(var):
+                continue
+            nxt = self._open_frame(max_attempts_per_var)
+            if nxt is True:
                 return True
-            self._remove(var, val)
-
+            if nxt is False:
+                continue  # dead end below: same frame, next candidate
+            stack.append(nxt)
         return False
 
     def solve(self, seed: int = 123):
@@ -486,11 +777,14 @@ class TimetableCSPv2:
         return valid_assignments
     
 def read_input_v2(xlsx_path: str):
+    # One ExcelFile handle for every sheet: pd.read_excel(path, ...) re-opens
+    # and re-parses the whole workbook per call, so each sheet read here used
+    # to pay the full unzip/parse cost again
     xls = pd.ExcelFile(xlsx_path)
-    window = pd.read_excel(xlsx_path, "WINDOW")
-    slots  = pd.read_excel(xlsx_path, "TIMESLOTS")
-    reqdf  = pd.read_excel(xlsx_path, "REQUIREMENTS")
-    daysdf = pd.read_excel(xlsx_path, "DAYS") if "DAYS" in xls.sheet_names else pd.DataFrame({"day":["Mon","Tue","Wed","Thu","Fri"]})
+    window = xls.parse("WINDOW")
+    slots  = xls.parse("TIMESLOTS")
+    reqdf  = xls.parse("REQUIREMENTS")
+    daysdf = xls.parse("DAYS") if "DAYS" in xls.sheet_names else pd.DataFrame({"day":["Mon","Tue","Wed","Thu","Fri"]})
 
     start_date = str(window.iloc[0]["start_date"])
     end_date   = str(window.iloc[0]["end_date"])
@@ -523,23 +817,30 @@ def read_input_v2(xlsx_path: str):
             continue
         timeslots.append(Timeslot(sid, st, et))
 
-    # ✅ Build requirements
+    # ✅ Build requirements (clean whole columns at once, then one zip pass
+    # instead of per-cell str/strip work under itertuples)
+    cc_col  = reqdf["course_code"].astype(str).str.strip()
+    cur_col = reqdf["curriculum"].astype(str).str.strip()
+    sem_col = reqdf["semester"].astype(str).str.strip()
+    sec_col = reqdf["section_id"].astype(str).str.strip()
+    tch_col = reqdf["teacher"].astype(str).str.strip()
+    if "available_rooms" in reqdf.columns:
+        rooms_col = reqdf["available_rooms"].tolist()
+    else:
+        rooms_col = [""] * len(reqdf)
     reqs = []
-    for r in reqdf.itertuples(index=False):
-        rooms = [x.strip() for x in str(getattr(r, "available_rooms", "") or "").split(",") if x.strip()]
-        cc = str(r.course_code).strip()
-        cur = str(r.curriculum).strip()
-        sem = str(r.semester).strip()
-        sec = str(r.section_id).strip()
-        tch = str(r.teacher).strip()
+    for cc, cur, sem, sec, tch, n_slots, hrs, rooms_raw in zip(
+            cc_col, cur_col, sem_col, sec_col, tch_col,
+            reqdf["slots_required"], reqdf["min_total_hours"], rooms_col):
+        rooms = [x.strip() for x in str(rooms_raw or "").split(",") if x.strip()]
         reqs.append(Requirement(
             course_code=cc,
             curriculum=cur,
             semester=sem,
             section_id=sec,
             teacher=tch,
-            slots_required=int(r.slots_required),
-            min_total_hours=float(r.min_total_hours),
+            slots_required=int(n_slots),
+            min_total_hours=float(hrs),
             available_rooms=rooms
         ))
 
@@ -549,7 +850,7 @@ def read_input_v2(xlsx_path: str):
     # ✅ Breaks
     breaks = []
     if "BREAKS" in xls.sheet_names:
-        brdf = pd.read_excel(xlsx_path, "BREAKS")
+        brdf = xls.parse("BREAKS")
         for r in brdf.itertuples(index=False):
             bf = parse_time(getattr(r, "break_from", "") or "")
             bt = parse_time(getattr(r, "break_to", "") or "")
@@ -568,7 +869,7 @@ def read_input_v2(xlsx_path: str):
     # ✅ Teacher availability (support multiple days like "Mon / Wed")
     teacher_availability = {}
     if "TEACHER_AVAILABILITY" in xls.sheet_names:
-        tavdf = pd.read_excel(xlsx_path, "TEACHER_AVAILABILITY")
+        tavdf = xls.parse("TEACHER_AVAILABILITY")
         for r in tavdf.itertuples(index=False):
             teacher = str(r.teacher).strip()
             raw_days = str(r.day).strip()
@@ -862,7 +1163,7 @@ try:
                         continue
                 options += 1
 
-        min_needed = int(req.min_total_hours * 60)
+        min_needed = req.min_total_minutes
         max_possible = req.slots_required * max_slot_min
         msgs = []
         if options == 0:
